@@ -0,0 +1,72 @@
+import os
+from typing import List
+import numpy as np
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "db" calls the postgres functions through crud, "python" computes in-process.
+# The sql function bodies aren't in this repo, so the python path is written from
+# what they're assumed to do: int4 arguments and results, the "Even"/"Odd" strings
+# and celsius * 9 / 5 + 32 in that order. Those assumptions haven't been checked
+# against the database, so only switch to "python" after comparing the outputs.
+ARITHMETIC_BACKEND = os.getenv("ARITHMETIC_BACKEND", "db").lower()
+
+# assumed: the sql functions take and return postgres integer (int4)
+INT4_MIN = -2**31
+INT4_MAX = 2**31 - 1
+
+# assumed to be the strings the sql even/odd function returns
+EVEN = "Even"
+ODD = "Odd"
+
+def use_database() -> bool:
+    return ARITHMETIC_BACKEND == "db"
+
+def check_int4(values: np.ndarray):
+    if values.size and (values.min() < INT4_MIN or values.max() > INT4_MAX):
+        raise HTTPException(status_code=400, detail="integer out of range")
+
+def as_int_array(values) -> np.ndarray:
+    # int64 holds any int4 product or sum, so overflow is caught by check_int4
+    try:
+        array = np.asarray(values, dtype=np.int64)
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="integer out of range")
+    check_int4(array)
+    return array
+
+def square_many(numbers: List[int]) -> List[int]:
+    array = as_int_array(numbers)
+    result = array * array
+    check_int4(result)
+    return result.tolist()
+
+def add_many(a: List[int], b: List[int]) -> List[int]:
+    result = as_int_array(a) + as_int_array(b)
+    check_int4(result)
+    return result.tolist()
+
+def celsius_to_farenheit_many(celsius: List[float]) -> List[float]:
+    # assumed to be the sql function's operation order, so float rounding matches
+    return (np.asarray(celsius, dtype=np.float64) * 9 / 5 + 32).tolist()
+
+def even_odd_many(numbers: List[int]) -> List[str]:
+    array = as_int_array(numbers)
+    return np.where(array % 2 == 0, EVEN, ODD).tolist()
+
+# single value versions return the same shape as the crud.* db versions
+def get_square(number: int):
+    return {"square": square_many([number])[0]}
+
+def add_number(a: int, b: int):
+    return {"sum": add_many([a], [b])[0]}
+
+def celsius_to_farenheit(celsius: float):
+    if not isinstance(celsius, (int, float)):
+        raise HTTPException(status_code=400, detail="Invalid input type. Celsius must be a number")
+    return {"farenheit": celsius_to_farenheit_many([celsius])[0]}
+
+def check_even_odd(number: int):
+    return {"result": even_odd_many([number])[0]}
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+from sqlalchemy.exc import SQLAlchemyError
+from schemas import UserCreate, UserResponse, ClientResponse, UserLogin, StudentLogin, StudentResponse, FacultyLogin, FacultyResponse
+from fastapi import HTTPException
+from hashing_pool import hash_password_async, verify_password_async
+from pagination import DEFAULT_PAGE_SIZE, paginate
+from database import AsyncSessionLocalUsers, AsyncSessionLocalStudents, pin_to_primary
+from auth import password_needs_update
+
+# async versions of the hot crud.py functions, used with the get_async_db_* dependencies.
+# hashing is cpu bound, so password checks run in the hashing process pool.
+
+logger = logging.getLogger(__name__)
+
+# tables holding password hashes, and the session that writes to each
+PASSWORD_TABLES = {
+    "clients": AsyncSessionLocalUsers,
+    "students": AsyncSessionLocalStudents,
+    "faculties": AsyncSessionLocalStudents,
+}
+
+# keep references so pending rehash tasks aren't garbage collected
+rehash_tasks = set()
+
+async def rehash_password(table: str, user_id: int, password: str, old_hash: str):
+    try:
+        new_hash = await hash_password_async(password)
+        # compare-and-set: skip if the password changed since we read it
+        query = text(f"UPDATE {table} SET hashed_password = :new_hash WHERE id = :id AND hashed_password = :old_hash")
+        async with PASSWORD_TABLES[table]() as db:
+            await db.execute(query, {"new_hash": new_hash, "id": user_id, "old_hash": old_hash})
+            await db.commit()
+    except Exception as e:
+        # a later login will try again
+        logger.warning(f"Password rehash failed for {table} id {user_id}: {e}")
+
+# legacy (bcrypt or weaker argon2) hashes are upgraded after a successful login,
+# off the request path so the login doesn't pay for a second hash
+def schedule_rehash(table: str, row, password: str):
+    if not password_needs_update(row["hashed_password"]):
+        return
+    task = asyncio.create_task(rehash_password(table, row["id"], password, row["hashed_password"]))
+    rehash_tasks.add(task)
+    task.add_done_callback(rehash_tasks.discard)
+
+async def create_user(db: AsyncSession, user: UserCreate):
+    # single round trip: an empty RETURNING means the email was already taken
+    query = text("""
+        INSERT INTO users (name, email) VALUES (:name, :email)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, name, email
+    """)
+    result = await db.execute(query, {"name": user.name, "email": user.email})
+    user_res = result.mappings().first()
+    await db.commit()
+    if not user_res:
+        raise HTTPException(status_code=409, detail="User already exists")
+    return UserResponse(**user_res)
+
+async def get_user(db: AsyncSession, user_id: int):
+    query = text("SELECT id,name,email FROM users WHERE id = :id")
+    result = await db.execute(query, {"id": user_id})
+    user_res = result.mappings().first()
+    if not user_res:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    return UserResponse(**user_res)
+
+async def get_all_users(db: AsyncSession, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    query = text("SELECT id, name, email FROM users WHERE id > :after ORDER BY id LIMIT :limit")
+    result = await db.execute(query, {"after": after, "limit": limit + 1})
+    users, next_cursor = paginate(result.mappings().all(), limit)
+    return [UserResponse(**user) for user in users], next_cursor
+
+async def authenticate_client(db: AsyncSession, user: UserLogin) -> ClientResponse:
+    # a replica can still hold the hash from before a reset or registration
+    pin_to_primary(db)
+    query = text("SELECT * FROM clients WHERE email = :email")
+    try:
+        result = (await db.execute(query, {"email": user.email})).mappings().first()
+        if not result or not await verify_password_async(user.password, result["hashed_password"]):
+            return None
+        schedule_rehash("clients", result, user.password)
+        return ClientResponse(id = result["id"], firstname = result["firstname"], lastname = result["lastname"], email = result["email"], detail = "Login Successful")
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+async def authenticate_student(db: AsyncSession, student: StudentLogin) -> StudentResponse:
+    pin_to_primary(db)
+    query = text("SELECT * FROM students WHERE email = :email")
+    try:
+        result = (await db.execute(query, {"email": student.email})).mappings().first()
+        if not result or not await verify_password_async(student.password, result["hashed_password"]):
+            raise HTTPException(status_code = 401, detail = "Invalid email or password")
+        schedule_rehash("students", result, student.password)
+        return StudentResponse(id = result["id"], name = result["name"], usn = result["usn"], email = result["email"], detail = "Login Successful")
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+async def authenticate_faculty(db: AsyncSession, faculty: FacultyLogin) -> FacultyResponse:
+    pin_to_primary(db)
+    query = text("SELECT * FROM faculties WHERE email = :email")
+    try:
+        result = (await db.execute(query, {"email": faculty.email})).mappings().first()
+        if not result or not await verify_password_async(faculty.password, result["hashed_password"]):
+            raise HTTPException(status_code = 401, detail = "Invalid email or password")
+        schedule_rehash("faculties", result, faculty.password)
+        return FacultyResponse(id = result["id"], name = result["name"], email = result["email"], detail = "Login Successful")
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
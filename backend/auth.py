@@ -35,11 +35,14 @@ from dotenv import load_dotenv
 from jwt import PyJWTError
 from fastapi import Request, HTTPException
 from typing import Optional
-from collections import defaultdict
+from collections import OrderedDict
+import threading
 import time
 import re
 import logging
 import hashlib
+import json
+import redis
 
 logging.basicConfig(
     level=logging.INFO,
@@ -49,13 +52,6 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-login_attempts = defaultdict(list)
-blocked_ips = defaultdict(float)
-
-MAX_LOGIN_ATTEMPTS = 5
-BLOCK_DURATION = 900
-ATTEMPT_WINDOW = 300
-
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")  # Default to HS256
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
@@ -63,7 +59,32 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable is not set! Please check your .env file.")
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Argon2id for new hashes; bcrypt stays in the context (deprecated) so existing
+# hashes still verify and get flagged by needs_update for a rehash on login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 19456))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 1))
+ARGON2_CALIBRATE = os.getenv("ARGON2_CALIBRATE", "false").lower() == "true"
+ARGON2_TARGET_MS = int(os.getenv("ARGON2_TARGET_MS", 250))
+ARGON2_PARAMS_KEY = "auth:argon2_params"
+
+def build_password_context(time_cost: int, memory_cost: int, parallelism: int):
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__type="ID",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+argon2_params = {"time_cost": ARGON2_TIME_COST, "memory_cost": ARGON2_MEMORY_COST, "parallelism": ARGON2_PARALLELISM}
+password_context = build_password_context(**argon2_params)
+
+def configure_password_context(time_cost: int, memory_cost: int, parallelism: int):
+    global password_context, argon2_params
+    argon2_params = {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism}
+    password_context = build_password_context(**argon2_params)
 
 def hash_password(password: str):
     return password_context.hash(password)
@@ -71,6 +92,55 @@ def hash_password(password: str):
 def verify_password(original_password, hashed_password):
     return password_context.verify(original_password, hashed_password)
 
+def password_needs_update(hashed_password: str) -> bool:
+    return password_context.needs_update(hashed_password)
+
+def measure_argon2_ms(time_cost: int, memory_cost: int, parallelism: int, rounds: int = 3) -> float:
+    hasher = build_password_context(time_cost, memory_cost, parallelism)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+# picks the largest time cost that stays at or under target_ms on this host,
+# halving memory first if even a single pass is far too slow
+def calibrate_argon2(target_ms: int = ARGON2_TARGET_MS, memory_cost: int = ARGON2_MEMORY_COST, parallelism: int = ARGON2_PARALLELISM, max_time_cost: int = 10):
+    while memory_cost > 8192 and measure_argon2_ms(1, memory_cost, parallelism) > target_ms:
+        memory_cost //= 2
+
+    time_cost = 1
+    elapsed_ms = measure_argon2_ms(time_cost, memory_cost, parallelism)
+    while time_cost < max_time_cost:
+        next_ms = measure_argon2_ms(time_cost + 1, memory_cost, parallelism)
+        if next_ms > target_ms:
+            break
+        time_cost += 1
+        elapsed_ms = next_ms
+
+    return {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism, "measured_ms": round(elapsed_ms, 2)}
+
+# every worker must hash with the same parameters, otherwise needs_update flags the
+# other workers' hashes forever. The first worker to calibrate publishes its result.
+def load_argon2_params(redis_client):
+    if not ARGON2_CALIBRATE:
+        return argon2_params
+    try:
+        stored = redis_client.get(ARGON2_PARAMS_KEY)
+        if not stored:
+            calibrated = calibrate_argon2()
+            logger.info(f"Argon2 calibrated: {calibrated}")
+            redis_client.set(ARGON2_PARAMS_KEY, json.dumps(calibrated), nx=True)
+            stored = redis_client.get(ARGON2_PARAMS_KEY)
+    except redis.RedisError as e:
+        # the app starts without redis, so fall back to the env parameters
+        logger.warning(f"Argon2 params unavailable from redis, using ARGON2_* settings: {e}")
+        return argon2_params
+    params = json.loads(stored)
+    configure_password_context(params["time_cost"], params["memory_cost"], params["parallelism"])
+    return argon2_params
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -78,17 +148,86 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Verified token -> claims, so polling /me style routes skip jwt.decode for a
+# session we've already checked. Entries expire with the token's own exp and are
+# dropped on logout; only successful decodes are cached.
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+TOKEN_CACHE_MAX_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", 300))
+
+class TokenCache:
+    def __init__(self, max_entries: int, max_ttl: int):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "revocations": 0}
+
+    def get(self, token: str) -> Optional[dict]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if not entry or entry[0] <= time.time():
+                if entry:
+                    del self.entries[token]
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(token)
+            self.stats["hits"] += 1
+            return dict(entry[1])
+
+    def set(self, token: str, claims: dict):
+        # tokens without exp are still re-verified every max_ttl seconds
+        expires_at = time.time() + self.max_ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        with self.lock:
+            self.entries[token] = (expires_at, dict(claims))
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def revoke(self, token: str):
+        with self.lock:
+            if self.entries.pop(token, None):
+                self.stats["revocations"] += 1
+
+    def get_stats(self):
+        with self.lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self.stats["hits"] / total, 4) if total else 0.0,
+            }
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_MAX_TTL_SECONDS)
+
+def revoke_token(token: str):
+    token_cache.revoke(token)
+
+# claims of a valid token (cached), or None if it doesn't verify
+def verify_token(token: str) -> Optional[dict]:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except PyJWTError:
+        return None
+    token_cache.set(token, payload)
+    return payload
+
 def get_current_user(request: Request):
     token = request.cookies.get("token")
     if not token:
         raise HTTPException(status_code=401, detail="Missing token")
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-        
-    except PyJWTError:
+    payload = verify_token(token)
+    if payload is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return payload
     
 def create_password_reset_token(user_id: int, email: str):
     to_encode = {
@@ -155,37 +294,6 @@ def get_client_ip(request: Request) -> str:
     
     return request.client.host
 
-def is_rate_limited(ip_address: str) -> tuple[bool, Optional[str]]:
-    current_time = time.time()
-    
-    # Check if IP is currently blocked
-    if ip_address in blocked_ips:
-        if current_time < blocked_ips[ip_address]:
-            remaining_time = int(blocked_ips[ip_address] - current_time)
-            return True, f"Too many failed attempts. Try again in {remaining_time} seconds"
-        else:
-            del blocked_ips[ip_address]
-            login_attempts[ip_address] = []
-    
-    # Clean old attempts
-    cutoff_time = current_time - ATTEMPT_WINDOW
-    login_attempts[ip_address] = [
-        attempt_time for attempt_time in login_attempts[ip_address] 
-        if attempt_time > cutoff_time
-    ]
-    
-    # Check if too many attempts
-    if len(login_attempts[ip_address]) >= MAX_LOGIN_ATTEMPTS:
-        blocked_ips[ip_address] = current_time + BLOCK_DURATION
-        logger.warning(f"IP {ip_address} blocked due to too many failed login attempts")
-        return True, f"Too many failed attempts. Blocked for {BLOCK_DURATION // 60} minutes"
-    
-    return False, None
-
-def record_failed_attempt(ip_address: str):
-    current_time = time.time()
-    login_attempts[ip_address].append(current_time)
-    
 def sanitize_input(input_string: str) -> str:
     if not input_string:
         return ""
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+import redis
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from dotenv import load_dotenv
+from pagination import NEXT_CURSOR_HEADER, decode_cursor
+from redis_connxn import r
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 300))
+CACHE_LOCAL_TTL_SECONDS = int(os.getenv("CACHE_LOCAL_TTL_SECONDS", 30))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 512))
+CACHE_PREFIX = "cache:"
+
+# Read-through cache: process-local LRU (short ttl) in front of redis (longer ttl).
+# Values are already serialized JSON bytes, so a hit is just a dict lookup.
+# The local ttl bounds how long another worker's invalidation can go unseen.
+class TwoTierCache:
+    def __init__(self, redis_client, ttl: int, local_ttl: int, max_entries: int):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"local_hits": 0, "redis_hits": 0, "misses": 0})
+
+    def get_local(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.local.get(key)
+            if not entry:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.local[key]
+                return None
+            self.local.move_to_end(key)
+            return value
+
+    def set_local(self, key: str, value: bytes):
+        with self.lock:
+            self.local[key] = (time.monotonic() + self.local_ttl, value)
+            self.local.move_to_end(key)
+            while len(self.local) > self.max_entries:
+                self.local.popitem(last=False)
+
+    def count(self, name: str, outcome: str):
+        with self.lock:
+            self.stats[name][outcome] += 1
+
+    # use_local=False skips the process-local tier, for results that must change on
+    # every worker as soon as they're invalidated (redis is shared, the local tier isn't)
+    def get_or_load(self, name: str, key: str, loader, use_local: bool = True) -> bytes:
+        value = self.get_local(key) if use_local else None
+        if value is not None:
+            self.count(name, "local_hits")
+            return value
+
+        try:
+            cached = self.redis_client.get(CACHE_PREFIX + key)
+        except redis.RedisError as e:
+            logger.warning(f"Cache redis read failed for {key}: {e}")
+            cached = None
+        if cached is not None:
+            self.count(name, "redis_hits")
+            value = cached.encode() if isinstance(cached, str) else cached
+            if use_local:
+                self.set_local(key, value)
+            return value
+
+        self.count(name, "misses")
+        value = loader()
+        try:
+            # track keys per name so invalidation doesn't need a keyspace SCAN
+            pipe = self.redis_client.pipeline()
+            pipe.set(CACHE_PREFIX + key, value, ex=self.ttl)
+            pipe.sadd(f"{CACHE_PREFIX}index:{name}", CACHE_PREFIX + key)
+            pipe.expire(f"{CACHE_PREFIX}index:{name}", self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Cache redis write failed for {key}: {e}")
+        if use_local:
+            self.set_local(key, value)
+        return value
+
+    def invalidate(self, name: str):
+        with self.lock:
+            for key in [key for key in self.local if key.startswith(f"{name}:")]:
+                del self.local[key]
+        try:
+            index = f"{CACHE_PREFIX}index:{name}"
+            keys = self.redis_client.smembers(index)
+            self.redis_client.delete(index, *keys)
+        except redis.RedisError as e:
+            logger.warning(f"Cache redis invalidation failed for {name}: {e}")
+
+    def get_stats(self):
+        with self.lock:
+            local_entries = len(self.local)
+            snapshot = {name: dict(counts) for name, counts in self.stats.items()}
+        per_key = {}
+        for name, counts in snapshot.items():
+            total = counts["local_hits"] + counts["redis_hits"] + counts["misses"]
+            hit_rate = (counts["local_hits"] + counts["redis_hits"]) / total if total else 0.0
+            per_key[name] = {**counts, "hit_rate": round(hit_rate, 4)}
+        return {"local_entries": local_entries, "keys": per_key}
+
+content_cache = TwoTierCache(r, CACHE_TTL_SECONDS, CACHE_LOCAL_TTL_SECONDS, CACHE_MAX_ENTRIES)
+
+# cached value layout: "<next cursor>\n<json body>"
+def cached_page(name: str, loader, db, cursor: Optional[str], limit: int) -> Response:
+    after = decode_cursor(cursor)
+
+    def load() -> bytes:
+        records, next_cursor = loader(db, after, limit)
+        body = json.dumps(jsonable_encoder(records), separators=(",", ":"))
+        return f"{next_cursor or ''}\n{body}".encode()
+
+    value = content_cache.get_or_load(name, f"{name}:{after}:{limit}", load)
+    next_cursor, body = value.split(b"\n", 1)
+    headers = {NEXT_CURSOR_HEADER: next_cursor.decode()} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def invalidate_cache(name: str):
+    content_cache.invalidate(name)
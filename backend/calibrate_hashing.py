@@ -0,0 +1,12 @@
+# Measures Argon2id on this host and prints settings for .env
+# usage: python calibrate_hashing.py [target_ms]
+import sys
+from auth import calibrate_argon2, ARGON2_TARGET_MS
+
+if __name__ == "__main__":
+    target_ms = int(sys.argv[1]) if len(sys.argv) > 1 else ARGON2_TARGET_MS
+    params = calibrate_argon2(target_ms=target_ms)
+    print(f"# measured {params['measured_ms']} ms per hash (target {target_ms} ms)")
+    print(f"ARGON2_TIME_COST={params['time_cost']}")
+    print(f"ARGON2_MEMORY_COST={params['memory_cost']}")
+    print(f"ARGON2_PARALLELISM={params['parallelism']}")
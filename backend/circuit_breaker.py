@@ -0,0 +1,153 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_BREAKER_FAILURE_THRESHOLD = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", 5))
+REDIS_BREAKER_RESET_SECONDS = float(os.getenv("REDIS_BREAKER_RESET_SECONDS", 30))
+REDIS_FALLBACK_MAX_ENTRIES = int(os.getenv("REDIS_FALLBACK_MAX_ENTRIES", 10000))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# subclass of ConnectionError so existing `except redis.RedisError` handlers cover it
+class CircuitOpenError(redis.ConnectionError):
+    pass
+
+# Trips after `failure_threshold` consecutive connection errors/timeouts. While open,
+# calls fail immediately instead of waiting on socket timeouts; after `reset_seconds`
+# a single trial call is let through and its outcome closes or re-opens the circuit.
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "trips": 0}
+
+    def before_call(self):
+        with self.lock:
+            self.stats["calls"] += 1
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                return
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is {self.state}")
+
+    def on_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f"[BREAKER] {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def on_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.stats["failures"] += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.stats["trips"] += 1
+                    logger.warning(f"[BREAKER] {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError):
+            self.on_failure()
+            raise
+        except redis.RedisError:
+            # redis answered (e.g. a command error), so the connection is fine
+            self.on_success()
+            raise
+        except Exception:
+            # anything else still has to settle the state, or a failed half-open
+            # trial would leave the breaker rejecting every call for good
+            self.on_failure()
+            raise
+        self.on_success()
+        return result
+
+    def get_stats(self):
+        with self.lock:
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)) if self.state == OPEN else 0.0
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": round(retry_in, 2),
+                **self.stats,
+            }
+
+# Bounded in-process key -> value store with per-key expiry, used in place of
+# redis while the breaker is open. Least recently written keys go first when full.
+class LocalExpiringStore:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_entry(self, key: str):
+        entry = self.entries.get(key)
+        if entry and entry[0] <= time.monotonic():
+            del self.entries[key]
+            return None
+        return entry
+
+    def put(self, key: str, value, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.get_entry(key)
+            return entry[1] if entry else None
+
+    def set(self, key: str, value, ttl: float):
+        with self.lock:
+            self.put(key, value, ttl)
+
+    # same as redis INCR + EXPIRE: returns (new value, seconds left).
+    # keep_ttl only sets the expiry on the first increment (a fixed window)
+    def incr(self, key: str, ttl: float, keep_ttl: bool = False, amount: int = 1):
+        with self.lock:
+            entry = self.get_entry(key)
+            value = (entry[1] if entry else 0) + amount
+            if entry and keep_ttl:
+                ttl = entry[0] - time.monotonic()
+            self.put(key, value, ttl)
+            return value, max(0, math.ceil(ttl))
+
+    # returns (value, seconds left), (0, -1) when missing
+    def peek(self, key: str):
+        with self.lock:
+            entry = self.get_entry(key)
+            if not entry:
+                return 0, -1
+            return entry[1], max(0, int(entry[0] - time.monotonic()))
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+redis_breaker = CircuitBreaker("redis", REDIS_BREAKER_FAILURE_THRESHOLD, REDIS_BREAKER_RESET_SECONDS)
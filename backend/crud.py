@@ -1,25 +1,54 @@
 from sqlalchemy.orm import Session
+import os
+import threading
+from typing import List
+from collections import OrderedDict
 from sqlalchemy.sql import text
 from sqlalchemy.exc import DBAPIError
 # from models import User
-from schemas import UserCreate, UserResponse, UserUpdate, ClientCreate, ClientResponse, UserLogin, TestingSchema, TestingTwoSchema, InsightsSchema, CommunitiesSchema, StudentCreate, StudentResponse, StudentLogin, FacultyCreate, FacultyLogin, FacultyResponse
+from schemas import UserCreate, UserResponse, UserUpdate, UserBulkUpdate, BulkItemResult, BulkResponse, ClientCreate, ClientResponse, TestingSchema, TestingTwoSchema, InsightsSchema, CommunitiesSchema, StudentCreate, StudentResponse, FacultyCreate, FacultyResponse
 from fastapi import HTTPException
-from sqlalchemy.exc import SQLAlchemyError
-from auth import hash_password, verify_password
-def create_user(db: Session, user: UserCreate):
-    query = text("SELECT id FROM users WHERE email = :email")
-    result = db.execute(query, {"email": user.email})
-    existing_user = result.mappings().first()
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from hashing_pool import hash_password
+from pagination import DEFAULT_PAGE_SIZE, paginate, decode_cursor_value
+from database import pin_to_primary
+from datetime import datetime
+from typing import Optional
+
+# emails we already know are registered, per table. Only positive hits are cached
+# (accounts in these tables are never deleted) so a repeat registration skips the
+# password hash and the insert entirely.
+REGISTERED_EMAIL_CACHE_SIZE = int(os.getenv("REGISTERED_EMAIL_CACHE_SIZE", 10000))
+registered_emails = OrderedDict()
+registered_emails_lock = threading.Lock()
+
+def is_known_registered(table: str, email: str) -> bool:
+    key = (table, email)
+    with registered_emails_lock:
+        if key in registered_emails:
+            registered_emails.move_to_end(key)
+            return True
+        return False
+
+def remember_registered(table: str, email: str):
+    with registered_emails_lock:
+        registered_emails[(table, email)] = True
+        registered_emails.move_to_end((table, email))
+        if len(registered_emails) > REGISTERED_EMAIL_CACHE_SIZE:
+            registered_emails.popitem(last=False)
 
-    if existing_user:
-        raise HTTPException(status_code=409, detail="User already exists")
-    
-    query = text("INSERT INTO users (name, email) VALUES (:name, :email) RETURNING id, name, email")
+def create_user(db: Session, user: UserCreate):
+    # single round trip: an empty RETURNING means the email was already taken
+    query = text("""
+        INSERT INTO users (name, email) VALUES (:name, :email)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, name, email
+    """)
     result = db.execute(query, {"name": user.name, "email": user.email})
-    db.commit()
     user_res = result.mappings().first()
+    db.commit()
     if not user_res:
-        raise HTTPException(status_code=500, detail="User creation failed")
+        raise HTTPException(status_code=409, detail="User already exists")
     return UserResponse(**user_res)
 
 #function to get user by id
@@ -34,11 +63,18 @@ def get_user(db: Session, user_id: int):
         raise HTTPException(status_code=404, detail="Employee not found")
     return UserResponse(**user_res)
 
-def get_all_users(db: Session):
-    query = text("SELECT id, name, email FROM users")
-    result = db.execute(query)
-    users = result.mappings().all()
-    return [UserResponse(**user) for user in users]
+def get_all_users(db: Session, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    query = text("SELECT id, name, email FROM users WHERE id > :after ORDER BY id LIMIT :limit")
+    result = db.execute(query, {"after": after, "limit": limit + 1})
+    users, next_cursor = paginate(result.mappings().all(), limit)
+    return [UserResponse(**user) for user in users], next_cursor
+
+# server-side cursor: rows are pulled from postgres chunk_size at a time
+def stream_users(db: Session, chunk_size: int):
+    query = text("SELECT id, name, email FROM users ORDER BY id")
+    result = db.execute(query, execution_options={"stream_results": True, "yield_per": chunk_size})
+    for rows in result.mappings().partitions(chunk_size):
+        yield rows
 
 def update_user(db: Session, user_id: int, user: UserUpdate):
     query = text("UPDATE users SET name = COALESCE(:name, name), email = COALESCE(:email, email) WHERE id = :id RETURNING id, name, email")
@@ -60,21 +96,133 @@ def delete_user(db: Session, user_id:int):
     return UserResponse(**user_res)
 
 
+# BULK USERS - one statement and one commit per batch
+
+BULK_MAX_ITEMS = 1000
+
+def check_bulk_size(items):
+    if not items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+def bulk_response(results: List[BulkItemResult], ok_status: str) -> BulkResponse:
+    succeeded = sum(1 for item in results if item.status == ok_status)
+    return BulkResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+def bulk_create_users(db: Session, users: List[UserCreate]) -> BulkResponse:
+    check_bulk_size(users)
+    values = ", ".join(f"(:name_{i}, :email_{i})" for i in range(len(users)))
+    params = {}
+    for i, user in enumerate(users):
+        params[f"name_{i}"] = user.name
+        params[f"email_{i}"] = user.email
+
+    query = text(f"""
+        INSERT INTO users (name, email) VALUES {values}
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, name, email
+    """)
+    try:
+        rows = db.execute(query, params).mappings().all()
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+    created = {row["email"]: row for row in rows}
+    results = []
+    for i, user in enumerate(users):
+        # pop so a duplicate email later in the same batch reports a conflict
+        row = created.pop(user.email, None)
+        if row:
+            results.append(BulkItemResult(index=i, status="created", user=UserResponse(**row)))
+        else:
+            results.append(BulkItemResult(index=i, status="conflict", detail="User already exists"))
+    return bulk_response(results, "created")
+
+def bulk_update_users(db: Session, users: List[UserBulkUpdate]) -> BulkResponse:
+    check_bulk_size(users)
+    # UPDATE ... FROM applies only one VALUES row per target row, so repeated ids are
+    # merged first: later non-null fields win, like sequential single updates would
+    merged = {}
+    for user in users:
+        fields = merged.setdefault(user.id, {"name": None, "email": None})
+        if user.name is not None:
+            fields["name"] = user.name
+        if user.email is not None:
+            fields["email"] = user.email
+
+    values = ", ".join(
+        f"(CAST(:id_{i} AS integer), CAST(:name_{i} AS text), CAST(:email_{i} AS text))" for i in range(len(merged))
+    )
+    params = {}
+    for i, (user_id, fields) in enumerate(merged.items()):
+        params[f"id_{i}"] = user_id
+        params[f"name_{i}"] = fields["name"]
+        params[f"email_{i}"] = fields["email"]
+
+    query = text(f"""
+        UPDATE users AS u
+        SET name = COALESCE(v.name, u.name), email = COALESCE(v.email, u.email)
+        FROM (VALUES {values}) AS v(id, name, email)
+        WHERE u.id = v.id
+        RETURNING u.id, u.name, u.email
+    """)
+    try:
+        rows = db.execute(query, params).mappings().all()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Batch rejected: an email is already in use")
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+    updated = {row["id"]: row for row in rows}
+    results = []
+    for i, user in enumerate(users):
+        row = updated.get(user.id)
+        if row:
+            results.append(BulkItemResult(index=i, status="updated", user=UserResponse(**row)))
+        else:
+            results.append(BulkItemResult(index=i, status="not_found", detail="User not found"))
+    return bulk_response(results, "updated")
+
+def bulk_delete_users(db: Session, user_ids: List[int]) -> BulkResponse:
+    check_bulk_size(user_ids)
+    query = text("DELETE FROM users WHERE id = ANY(:ids) RETURNING id, name, email")
+    try:
+        rows = db.execute(query, {"ids": list(user_ids)}).mappings().all()
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+    deleted = {row["id"]: row for row in rows}
+    results = []
+    for i, user_id in enumerate(user_ids):
+        row = deleted.pop(user_id, None)
+        if row:
+            results.append(BulkItemResult(index=i, status="deleted", user=UserResponse(**row)))
+        else:
+            results.append(BulkItemResult(index=i, status="not_found", detail="User not found"))
+    return bulk_response(results, "deleted")
+
+
 # CLIENTS LOGIN AND REGISTER
 
 def create_client(db: Session, user: ClientCreate) -> ClientResponse:
-    # CHECK EMAIL IF IT ALREADY EXISTS
-    check_email = text("SELECT id FROM clients WHERE email = :email")
+    # CHECK EMAIL IF IT ALREADY EXISTS (cached, no db round trip)
+    if is_known_registered("clients", user.email):
+        raise HTTPException(status_code=400, detail="Email already registered!")
     try:
-        check_email_result = db.execute(check_email, {"email": user.email}).first()
-        if check_email_result:
-            raise HTTPException(status_code=400, detail="Email already registered!") 
-        
-        # INSERT USER
+        # INSERT USER, an empty RETURNING means the email already exists
         hashed_password = hash_password(user.password)
         query = text("""
             INSERT INTO clients (firstname, lastname, email, hashed_password)
             VALUES (:firstname, :lastname, :email, :hashed_password)
+            ON CONFLICT (email) DO NOTHING
             RETURNING id, firstname, lastname, email
         """)
         result = db.execute(query, {
@@ -83,26 +231,17 @@ def create_client(db: Session, user: ClientCreate) -> ClientResponse:
             "email": user.email,
             "hashed_password": hashed_password
         })
-        db.commit()
         client_res = result.mappings().first()
+        db.commit()
+        remember_registered("clients", user.email)
+        if not client_res:
+            raise HTTPException(status_code=400, detail="Email already registered!")
         return ClientResponse(**client_res)
     
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     
-def authenticate_client(db: Session, user: UserLogin) -> UserResponse:
-    query = text("SELECT * FROM clients WHERE email = :email")
-    try:
-        result = db.execute(query, {"email": user.email}).mappings().first()
-        if not result or not verify_password(user.password, result["hashed_password"]):
-            return None
-        return ClientResponse(id = result["id"], firstname = result["firstname"], lastname = result["lastname"], email = result["email"], detail = "Login Successful")
-    
-    except SQLAlchemyError as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
-    
 def get_user_by_email(db: Session, email: str):
     query = text("SELECT id, firstname, lastname, email FROM clients WHERE email = :email")
     try:
@@ -153,23 +292,60 @@ def verify_reset_token(db: Session, user_id: int, token: str):
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
 
 def update_user_password(db: Session, user_id: int, new_password: str):
-    hashed_password = hash_password(new_password)
+    return update_user_password_hash(db, user_id, hash_password(new_password))
+
+def update_user_password_hash(db: Session, user_id: int, hashed_password: str):
     query = text("""
         UPDATE clients 
         SET hashed_password = :hashed_password, updated_at = NOW()
         WHERE id = :user_id
+        RETURNING id, firstname, lastname, email
     """)
     
     try:
-        db.execute(query, {
+        result = db.execute(query, {
             "hashed_password": hashed_password,
             "user_id": user_id
-        })
+        }).mappings().first()
         db.commit()
         
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+    if not result:
+        return None
+    return ClientResponse(id = result["id"], firstname = result["firstname"], lastname = result["lastname"], email = result["email"], detail = "Password updated")
+
+# verify + consume the token and update the password as a single statement, so
+# a crash can't leave a changed password with a live token. Returns the client's
+# name and email for the confirmation mail, or None if the token is invalid/expired.
+def reset_password_with_token(db: Session, user_id: int, token: str, new_password: str):
+    hashed_password = hash_password(new_password)
+    query = text("""
+        WITH consumed AS (
+            DELETE FROM password_reset_tokens
+            WHERE user_id = :user_id AND token = :token AND expires_at > NOW()
+            RETURNING user_id
+        )
+        UPDATE clients AS c
+        SET hashed_password = :hashed_password, updated_at = NOW()
+        FROM consumed
+        WHERE c.id = consumed.user_id
+        RETURNING c.id, c.firstname, c.lastname, c.email
+    """)
+    try:
+        result = db.execute(query, {
+            "user_id": user_id,
+            "token": token,
+            "hashed_password": hashed_password
+        }).mappings().first()
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+    if not result:
+        return None
+    return ClientResponse(id = result["id"], firstname = result["firstname"], lastname = result["lastname"], email = result["email"], detail = "Password reset")
 
 def delete_reset_token(db: Session, user_id: int, token: str):
     query = text("DELETE FROM password_reset_tokens WHERE user_id = :user_id AND token = :token")
@@ -182,13 +358,27 @@ def delete_reset_token(db: Session, user_id: int, token: str):
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
 
-def cleanup_expired_tokens(db: Session):
-    query = text("DELETE FROM password_reset_tokens WHERE expires_at < NOW()")
+# deletes in bounded batches, committing each, so no single statement holds locks for long
+def cleanup_expired_tokens(db: Session, batch_size: int = 1000, max_batches: int = 100):
+    query = text("""
+        DELETE FROM password_reset_tokens
+        WHERE ctid IN (
+            SELECT ctid FROM password_reset_tokens
+            WHERE expires_at < NOW()
+            LIMIT :batch_size
+        )
+    """)
     
+    removed = 0
     try:
-        result = db.execute(query)
-        db.commit()
-        print(f"[CLEANUP] Removed {result.rowcount} expired password reset tokens")
+        for _ in range(max_batches):
+            result = db.execute(query, {"batch_size": batch_size})
+            db.commit()
+            removed += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        print(f"[CLEANUP] Removed {removed} expired password reset tokens")
+        return removed
         
     except SQLAlchemyError as e:
         db.rollback()
@@ -230,6 +420,27 @@ def check_even_odd(db: Session, number: int):
         raise HTTPException(status_code=400, detail="Invalid input or function failed")
     return {"result": even_odd["check_even_odd"]}
 
+# batch versions: one round trip for a whole vector of inputs
+def get_square_many(db: Session, numbers: List[int]):
+    query = text("SELECT square(n) FROM unnest(CAST(:numbers AS integer[])) WITH ORDINALITY AS t(n, i) ORDER BY i")
+    return list(db.execute(query, {"numbers": numbers}).scalars().all())
+
+def add_numbers_many(db: Session, a: List[int], b: List[int]):
+    query = text("""
+        SELECT add_numbers(x, y)
+        FROM unnest(CAST(:a AS integer[]), CAST(:b AS integer[])) WITH ORDINALITY AS t(x, y, i)
+        ORDER BY i
+    """)
+    return list(db.execute(query, {"a": a, "b": b}).scalars().all())
+
+def celsius_to_farenheit_many(db: Session, celsius: List[float]):
+    query = text("SELECT celsius_to_farenheit(c) FROM unnest(CAST(:celsius AS float8[])) WITH ORDINALITY AS t(c, i) ORDER BY i")
+    return list(db.execute(query, {"celsius": celsius}).scalars().all())
+
+def check_even_odd_many(db: Session, numbers: List[int]):
+    query = text("SELECT check_even_odd(n) FROM unnest(CAST(:numbers AS integer[])) WITH ORDINALITY AS t(n, i) ORDER BY i")
+    return list(db.execute(query, {"numbers": numbers}).scalars().all())
+
 def get_high_salary_employees(db: Session, salary_threshold: int):
     query = text("SELECT * FROM get_high_salary_employees(:salary_threshold)")
     result = db.execute(query, {"salary_threshold": salary_threshold})
@@ -272,12 +483,44 @@ def calculate_bonus(db: Session, emp_id: int):
             raise HTTPException(status_code=404, detail=str(orig))
         raise HTTPException(status_code=500, detail="Database error occurred")
     
-def list_employees(db: Session):
-    query = text("SELECT * FROM list_employees()")
+# set-based: one query for many employees. calculate_bonus() is still the single
+# source of the bonus rules, postgres just evaluates it per row server-side
+def calculate_bonuses(db: Session, emp_ids: Optional[List[int]] = None, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    id_filter = "AND e.id = ANY(:emp_ids)" if emp_ids else ""
+    query = text(f"""
+        SELECT e.id AS emp_id, b.emp_name AS name, b.emp_bonus AS bonus
+        FROM employees AS e
+        CROSS JOIN LATERAL calculate_bonus(e.id) AS b
+        WHERE e.id > :after {id_filter}
+        ORDER BY e.id
+        LIMIT :limit
+    """)
+    params = {"after": after, "limit": limit + 1}
+    if emp_ids:
+        params["emp_ids"] = list(emp_ids)
+    try:
+        result = db.execute(query, params)
+        return paginate(result.mappings().all(), limit, key="emp_id")
+    except DBAPIError as e:
+        orig = e.orig
+        if orig:
+            raise HTTPException(status_code=400, detail=str(orig))
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    
+def list_employees(db: Session, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    # straight off the employees primary key, so a page only reads the rows it returns
+    # (filtering list_employees() output would build the whole set for every page)
+    query = text("""
+        SELECT id AS emp_id, name AS emp_name, salary AS emp_salary
+        FROM employees
+        WHERE id > :after
+        ORDER BY id
+        LIMIT :limit
+    """)
     try:
-        result = db.execute(query)
-        employees = result.mappings().all()
-        return employees
+        result = db.execute(query, {"after": after, "limit": limit + 1})
+        employees, next_cursor = paginate(result.mappings().all(), limit, key="emp_id")
+        return employees, next_cursor
     except DBAPIError as e:
         # Extract PostgreSQL error message
         orig = e.orig
@@ -296,19 +539,161 @@ def update_salary(db: Session, emp_id: int, new_salary: int):
         raise HTTPException(status_code=404, detail=f"Employee with id {emp_id} not found")
     return {"message": "salary updated successfully", "emp_id": emp_id, "new_salary": new_salary}
 
-def get_salary_logs(db: Session): #, emp_id: int
-    query = text("SELECT * FROM salary_log") # WHERE emp_id = :emp_id
+def bulk_update_salary(db: Session, updates):
+    check_bulk_size(updates)
+    # last entry wins if an emp_id is repeated, like sequential single updates would
+    latest = {}
+    invalid = []
+    for update in updates:
+        if update.new_salary < 0:
+            invalid.append({"emp_id": update.emp_id, "detail": "Salary cannot be negative"})
+        else:
+            latest[update.emp_id] = update.new_salary
+    if not latest:
+        return {"message": "No salaries updated", "updated": [], "missing": [], "invalid": invalid}
+
+    values = ", ".join(
+        f"(CAST(:emp_id_{i} AS integer), CAST(:new_salary_{i} AS integer))" for i in range(len(latest))
+    )
+    params = {}
+    for i, (emp_id, new_salary) in enumerate(latest.items()):
+        params[f"emp_id_{i}"] = emp_id
+        params[f"new_salary_{i}"] = new_salary
+
+    query = text(f"""
+        UPDATE employees AS e
+        SET salary = v.new_salary
+        FROM (VALUES {values}) AS v(emp_id, new_salary)
+        WHERE e.id = v.emp_id
+        RETURNING e.id, e.salary
+    """)
     try:
-        result = db.execute(query) #, {"emp_id": emp_id}
-        logs = result.mappings().all()
+        rows = db.execute(query, params).mappings().all()
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+    updated = [{"emp_id": row["id"], "new_salary": row["salary"]} for row in rows]
+    found = {row["id"] for row in rows}
+    missing = [emp_id for emp_id in latest if emp_id not in found]
+    return {
+        "message": f"{len(updated)} salaries updated successfully",
+        "updated": updated,
+        "missing": missing,
+        "invalid": invalid
+    }
+
+# keyset over (changed_at, id), backed by the indexes in migrations/001_salary_log_indexes.sql
+def get_salary_logs(
+    db: Session,
+    emp_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+):
+    conditions = []
+    params = {"limit": limit + 1}
+    if emp_id is not None:
+        conditions.append("emp_id = :emp_id")
+        params["emp_id"] = emp_id
+    if start is not None:
+        conditions.append("changed_at >= :start")
+        params["start"] = start
+    if end is not None:
+        conditions.append("changed_at < :end")
+        params["end"] = end
+    if cursor:
+        after = decode_cursor_value(cursor)
+        if not isinstance(after, list) or len(after) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        comparison = ">" if order == "asc" else "<"
+        conditions.append(f"(changed_at, id) {comparison} (CAST(:after_time AS timestamptz), :after_id)")
+        params["after_time"], params["after_id"] = after
+
+    direction = "ASC" if order == "asc" else "DESC"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = text(f"SELECT * FROM salary_log {where} ORDER BY changed_at {direction}, id {direction} LIMIT :limit")
+    try:
+        result = db.execute(query, params)
+        logs, next_cursor = paginate(result.mappings().all(), limit, key=("changed_at", "id"))
         
-        if not logs:
+        if not logs and not cursor:
             raise HTTPException(status_code=404, detail=f"No salary logs found")
-        return logs
+        return logs, next_cursor
     
     except SQLAlchemyError as e:
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     
+def stream_salary_logs(db: Session, chunk_size: int):
+    query = text("SELECT * FROM salary_log ORDER BY id")
+    result = db.execute(query, execution_options={"stream_results": True, "yield_per": chunk_size})
+    for rows in result.mappings().partitions(chunk_size):
+        yield rows
+    
+# one aggregate query: summary stats, percentiles and histogram counts.
+# with explicit edges, bucket 0 is below edges[0] and bucket len(edges) is >= the last edge
+def get_salary_stats(db: Session, percentiles: List[float], edges: Optional[List[float]] = None, bucket_count: int = 10):
+    if edges:
+        bucket_expr = "width_bucket(e.salary, CAST(:edges AS float8[]))"
+    else:
+        # equal width buckets over [min, max]; the max itself lands in bucket_count + 1, fold it back
+        bucket_expr = "LEAST(width_bucket(e.salary, s.min_salary, s.max_salary + 1e-9, :bucket_count), :bucket_count)"
+    query = text(f"""
+        WITH s AS (
+            SELECT
+                COUNT(*) AS count,
+                AVG(salary)::float8 AS mean,
+                MIN(salary)::float8 AS min_salary,
+                MAX(salary)::float8 AS max_salary,
+                percentile_cont(CAST(:percentiles AS float8[])) WITHIN GROUP (ORDER BY salary) AS percentiles
+            FROM employees
+        ),
+        h AS (
+            SELECT {bucket_expr} AS bucket, COUNT(*) AS count
+            FROM employees AS e CROSS JOIN s
+            WHERE e.salary IS NOT NULL
+            GROUP BY 1
+        )
+        SELECT s.*, (SELECT json_object_agg(bucket, count) FROM h) AS histogram
+        FROM s
+    """)
+    params = {"percentiles": percentiles, "bucket_count": bucket_count}
+    if edges:
+        params["edges"] = edges
+    try:
+        stats = db.execute(query, params).mappings().first()
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+    counts = {int(bucket): count for bucket, count in (stats["histogram"] or {}).items()}
+    histogram = []
+    if edges:
+        bounds = [None] + list(edges) + [None]
+        for bucket in range(len(edges) + 1):
+            histogram.append({"lower": bounds[bucket], "upper": bounds[bucket + 1], "count": counts.get(bucket, 0)})
+    elif stats["min_salary"] is not None:
+        # count is COUNT(*), so rows with only NULL salaries still have no bounds
+        low, high = stats["min_salary"], stats["max_salary"]
+        width = (high - low) / bucket_count
+        for bucket in range(1, bucket_count + 1):
+            histogram.append({
+                "lower": low + (bucket - 1) * width,
+                "upper": low + bucket * width,
+                "count": counts.get(bucket, 0)
+            })
+
+    return {
+        "count": stats["count"],
+        "mean": stats["mean"],
+        "min": stats["min_salary"],
+        "max": stats["max_salary"],
+        "percentiles": dict(zip([str(p) for p in percentiles], stats["percentiles"] or [])),
+        "histogram": histogram
+    }
+    
 def add_employee(db: Session, emp_name: str, emp_salary: int):
     query = text("CALL add_employee(:emp_name, :emp_salary)")
     try:
@@ -320,63 +705,168 @@ def add_employee(db: Session, emp_name: str, emp_salary: int):
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     
 def increase_all_salaries(db: Session, increase_percent: int):
+    # a chunked run still working through the table would apply its percentage on
+    # top of this one for the rows it hasn't reached yet
+    pin_to_primary(db)
     query = text("CALL increase_all_salaries(:increase_percent)")
     try:
+        active_run = db.execute(text("SELECT id FROM salary_increase_runs WHERE status = 'running' LIMIT 1")).scalar()
+        if active_run is not None:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"Salary increase run {active_run} is in progress")
         db.execute(query, {"increase_percent": increase_percent})
         db.commit()
         return {"message": f"All employees salaries were increased by {increase_percent}%"}
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+
+# CHUNKED SALARY INCREASE
+# Updates employees in id ranges of chunk_size and commits per chunk, so row locks
+# are only held for one chunk at a time. Progress lives in salary_increase_runs
+# (migrations/002_salary_increase_runs.sql) and is advanced in the same
+# transaction as the chunk, so a resumed run picks up exactly where it stopped.
+
+SALARY_INCREASE_CHUNK_SIZE = int(os.getenv("SALARY_INCREASE_CHUNK_SIZE", 1000))
+SALARY_INCREASE_LOCK_TIMEOUT = os.getenv("SALARY_INCREASE_LOCK_TIMEOUT", "2s")
+
+def start_salary_increase_run(db: Session, increase_percent: int, chunk_size: int):
+    query = text("""
+        INSERT INTO salary_increase_runs (increase_percent, chunk_size, start_id, last_id, max_id)
+        SELECT :increase_percent, :chunk_size, COALESCE(MIN(id), 1) - 1, COALESCE(MIN(id), 1) - 1, COALESCE(MAX(id), 0)
+        FROM employees
+        RETURNING id
+    """)
+    try:
+        run_id = db.execute(query, {"increase_percent": increase_percent, "chunk_size": chunk_size}).scalar()
+        db.commit()
+        return run_id
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A salary increase run is already in progress")
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+
+def get_salary_increase_run(db: Session, run_id: int):
+    query = text("SELECT * FROM salary_increase_runs WHERE id = :run_id")
+    run = db.execute(query, {"run_id": run_id}).mappings().first()
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Salary increase run {run_id} not found")
+    run = dict(run)
+    total = run["max_id"] - run["start_id"]
+    done = run["last_id"] - run["start_id"]
+    run["progress_percent"] = round(100.0 * done / total, 2) if total > 0 else 100.0
+    return run
+
+def resume_salary_increase_run(db: Session, run_id: int):
+    # failed runs, or runs whose worker stopped reporting (process died mid-run)
+    query = text("""
+        UPDATE salary_increase_runs SET status = 'running', error = NULL, updated_at = NOW()
+        WHERE id = :run_id
+          AND (status = 'failed' OR (status = 'running' AND updated_at < NOW() - INTERVAL '5 minutes'))
+        RETURNING id
+    """)
+    try:
+        resumed = db.execute(query, {"run_id": run_id}).first()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A salary increase run is already in progress")
+    if not resumed:
+        raise HTTPException(status_code=409, detail=f"Salary increase run {run_id} is not resumable")
+
+def run_salary_increase(db: Session, run_id: int):
+    # the run row was just written, so don't read it from a replica
+    pin_to_primary(db)
+    run = get_salary_increase_run(db, run_id)
+    db.rollback()
+    last_id = run["last_id"]
+    while last_id < run["max_id"]:
+        upper = min(last_id + run["chunk_size"], run["max_id"])
+        try:
+            db.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": SALARY_INCREASE_LOCK_TIMEOUT})
+            # claim the chunk first: if another worker already advanced the run, stop
+            claimed = db.execute(text("""
+                UPDATE salary_increase_runs SET last_id = :upper, updated_at = NOW()
+                WHERE id = :run_id AND last_id = :last_id AND status = 'running'
+            """), {"run_id": run_id, "last_id": last_id, "upper": upper})
+            if claimed.rowcount == 0:
+                db.rollback()
+                return
+            updated = db.execute(text("""
+                UPDATE employees SET salary = salary + (salary * :increase_percent / 100)
+                WHERE id > :last_id AND id <= :upper
+            """), {"increase_percent": run["increase_percent"], "last_id": last_id, "upper": upper})
+            db.execute(text("""
+                UPDATE salary_increase_runs SET rows_updated = rows_updated + :rows WHERE id = :run_id
+            """), {"run_id": run_id, "rows": updated.rowcount})
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            db.execute(text("""
+                UPDATE salary_increase_runs SET status = 'failed', error = :error, updated_at = NOW()
+                WHERE id = :run_id
+            """), {"run_id": run_id, "error": str(e)[:500]})
+            db.commit()
+            print(f"[SALARY_INCREASE] Run {run_id} failed at id {last_id}: {e}")
+            return
+        last_id = upper
+
+    db.execute(text("""
+        UPDATE salary_increase_runs SET status = 'completed', finished_at = NOW(), updated_at = NOW()
+        WHERE id = :run_id AND status = 'running'
+    """), {"run_id": run_id})
+    db.commit()
+    print(f"[SALARY_INCREASE] Run {run_id} completed")
     
     
 # Get all records from `testing` table
-def get_all_testing(db: Session):
-    query = text("SELECT id, img_url, name, role, email FROM testing")
-    result = db.execute(query)
-    records = result.mappings().all()
-    return [TestingSchema(**row) for row in records]
+def get_all_testing(db: Session, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    query = text("SELECT id, img_url, name, role, email FROM testing WHERE id > :after ORDER BY id LIMIT :limit")
+    result = db.execute(query, {"after": after, "limit": limit + 1})
+    records, next_cursor = paginate(result.mappings().all(), limit)
+    return [TestingSchema(**row) for row in records], next_cursor
 
 
 # Get all records from `testingtwo` table
-def get_all_testingtwo(db: Session):
-    query = text("SELECT id, img_url, name, date, time, location, request, role FROM testingtwo")
-    result = db.execute(query)
-    records = result.mappings().all()
-    return [TestingTwoSchema(**row) for row in records]
+def get_all_testingtwo(db: Session, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    query = text("SELECT id, img_url, name, date, time, location, request, role FROM testingtwo WHERE id > :after ORDER BY id LIMIT :limit")
+    result = db.execute(query, {"after": after, "limit": limit + 1})
+    records, next_cursor = paginate(result.mappings().all(), limit)
+    return [TestingTwoSchema(**row) for row in records], next_cursor
 
 
 # Get all records from `insights` table
-def get_all_insights(db: Session):
-    query = text("SELECT id, heading, subheading FROM insights")
-    result = db.execute(query)
-    records = result.mappings().all()
-    return [InsightsSchema(**row) for row in records]
+def get_all_insights(db: Session, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    query = text("SELECT id, heading, subheading FROM insights WHERE id > :after ORDER BY id LIMIT :limit")
+    result = db.execute(query, {"after": after, "limit": limit + 1})
+    records, next_cursor = paginate(result.mappings().all(), limit)
+    return [InsightsSchema(**row) for row in records], next_cursor
 
 
 # Get all records from `communities` table
-def get_all_communities(db: Session):
-    query = text("SELECT id, name, logo, privacy, members, date, notification FROM communities")
-    result = db.execute(query)
-    records = result.mappings().all()
-    return [CommunitiesSchema(**row) for row in records]
+def get_all_communities(db: Session, after: int = 0, limit: int = DEFAULT_PAGE_SIZE):
+    query = text("SELECT id, name, logo, privacy, members, date, notification FROM communities WHERE id > :after ORDER BY id LIMIT :limit")
+    result = db.execute(query, {"after": after, "limit": limit + 1})
+    records, next_cursor = paginate(result.mappings().all(), limit)
+    return [CommunitiesSchema(**row) for row in records], next_cursor
 
 
 # FOR CHARAIVETI
 
 def create_student(db: Session, student: StudentCreate) -> StudentResponse:
-    # CHECK EMAIL IF IT ALREADY EXISTS
-    check_email = text("SELECT id FROM students WHERE email = :email")
+    # CHECK EMAIL IF IT ALREADY EXISTS (cached, no db round trip)
+    if is_known_registered("students", student.email):
+        raise HTTPException(status_code=400, detail="Email already registered!")
     try:
-        check_email_result = db.execute(check_email, {"email": student.email}).first()
-        if check_email_result:
-            raise HTTPException(status_code=400, detail="Email already registered!") 
-        
-        # INSERT USER
+        # INSERT USER, an empty RETURNING means the email already exists
         hashed_password = hash_password(student.password)
         query = text("""
             INSERT INTO students (name, usn, email, hashed_password)
             VALUES (:name, :usn, :email, :hashed_password)
+            ON CONFLICT (email) DO NOTHING
             RETURNING id, name, usn, email
         """)
         result = db.execute(query, {
@@ -385,39 +875,28 @@ def create_student(db: Session, student: StudentCreate) -> StudentResponse:
             "email": student.email,
             "hashed_password": hashed_password
         })
-        db.commit()
         student_res = result.mappings().first()
+        db.commit()
+        remember_registered("students", student.email)
+        if not student_res:
+            raise HTTPException(status_code=400, detail="Email already registered!")
         return StudentResponse(**student_res)
     
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     
-def authenticate_student(db: Session, student: StudentLogin) -> StudentResponse:
-    query = text("SELECT * FROM students WHERE email = :email")
-    try:
-        result = db.execute(query, {"email": student.email}).mappings().first()
-        if not result or not verify_password(student.password, result["hashed_password"]):
-            raise HTTPException(status_code = 401, detail = "Invalid email or password")
-        return StudentResponse(id = result["id"], name = result["name"], usn = result["usn"], email = result["email"], detail = "Login Successful")
-    
-    except SQLAlchemyError as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
-
 def create_faculty(db: Session, faculty: FacultyCreate) -> FacultyResponse:
-    # CHECK EMAIL IF IT ALREADY EXISTS
-    check_email = text("SELECT id FROM faculties WHERE email = :email")
+    # CHECK EMAIL IF IT ALREADY EXISTS (cached, no db round trip)
+    if is_known_registered("faculties", faculty.email):
+        raise HTTPException(status_code=400, detail="Email already registered!")
     try:
-        check_email_result = db.execute(check_email, {"email": faculty.email}).first()
-        if check_email_result:
-            raise HTTPException(status_code=400, detail="Email already registered!") 
-        
-        # INSERT USER
+        # INSERT USER, an empty RETURNING means the email already exists
         hashed_password = hash_password(faculty.password)
         query = text("""
             INSERT INTO faculties (name, email, hashed_password)
             VALUES (:name, :email, :hashed_password)
+            ON CONFLICT (email) DO NOTHING
             RETURNING id, name, email
         """)
         result = db.execute(query, {
@@ -425,22 +904,14 @@ def create_faculty(db: Session, faculty: FacultyCreate) -> FacultyResponse:
             "email": faculty.email,
             "hashed_password": hashed_password
         })
-        db.commit()
         faculty_res = result.mappings().first()
+        db.commit()
+        remember_registered("faculties", faculty.email)
+        if not faculty_res:
+            raise HTTPException(status_code=400, detail="Email already registered!")
         return FacultyResponse(**faculty_res)
     
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
-    
-def authenticate_faculty(db: Session, faculty: FacultyLogin) -> FacultyResponse:
-    query = text("SELECT * FROM faculties WHERE email = :email")
-    try:
-        result = db.execute(query, {"email": faculty.email}).mappings().first()
-        if not result or not verify_password(faculty.password, result["hashed_password"]):
-            raise HTTPException(status_code = 401, detail = "Invalid email or password")
-        return FacultyResponse(id = result["id"], name = result["name"], email = result["email"], detail = "Login Successful")
-    
-    except SQLAlchemyError as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
\ No newline at end of file
+    
\ No newline at end of file
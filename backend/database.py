@@ -1,25 +1,174 @@
 # used to establish database connection
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 #create db session and define db models
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
 #read environment variables
 import os
+import random
 #access credentials
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SQL_ALCHEMY_DB_URL = os.getenv("DATABASE_URL")
-USERS_DB_URL = os.getenv("DATABASE_URL")
-STUDENTS_DB_URL = os.getenv("DATABASE_URL")
+USERS_DB_URL = os.getenv("USERS_DATABASE_URL", SQL_ALCHEMY_DB_URL)
+STUDENTS_DB_URL = os.getenv("STUDENTS_DATABASE_URL", SQL_ALCHEMY_DB_URL)
+# optional read replicas per primary, comma separated. The users/students databases
+# only inherit DATABASE_READ_URL when they are the main database.
+def read_urls(env_name: str, primary_url: str):
+    default = os.getenv("DATABASE_READ_URL", "") if primary_url == SQL_ALCHEMY_DB_URL else ""
+    return [url.strip() for url in os.getenv(env_name, default).split(",") if url.strip()]
 
-engine_main = create_engine(SQL_ALCHEMY_DB_URL)
-engine_users = create_engine(USERS_DB_URL)
-engine_students = create_engine(STUDENTS_DB_URL)
+READ_DB_URLS = read_urls("DATABASE_READ_URL", SQL_ALCHEMY_DB_URL)
+USERS_READ_DB_URLS = read_urls("USERS_DATABASE_READ_URL", USERS_DB_URL)
+STUDENTS_READ_DB_URLS = read_urls("STUDENTS_DATABASE_READ_URL", STUDENTS_DB_URL)
 
-SessionLocalMain = sessionmaker(autocommit=False, autoflush=False, bind=engine_main)
-SessionLocalUsers = sessionmaker(autocommit=False, autoflush=False, bind=engine_users)
-SessionLocalStudents = sessionmaker(autocommit=False, autoflush=False, bind=engine_students)
+# Pool settings (shared by every engine in this process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 10))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+# The asyncpg pools are separate from the psycopg2 ones, so a worker can hold up to
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) + (DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW)
+# connections per database. Size both with that total in mind.
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", 3))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", 2))
+
+# one engine (and so one connection pool) per distinct database url
+_engines = {}
+
+def get_engine(url: str):
+    if url not in _engines:
+        connect_args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+        _engines[url] = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args=connect_args,
+        )
+    return _engines[url]
+
+# async engines use asyncpg, which takes ssl / timeouts differently from psycopg2
+_async_engines = {}
+
+# query parameters the asyncpg dialect accepts as-is; libpq-only ones are dropped
+ASYNCPG_QUERY_PARAMS = {"prepared_statement_cache_size"}
+
+# libpq "options" is a string of "-c name=value" settings
+def parse_pg_options(options: str):
+    settings = {}
+    parts = options.replace("-c ", "-c").split()
+    for part in parts:
+        if part.startswith("-c") and "=" in part:
+            name, value = part[2:].split("=", 1)
+            settings[name] = value
+    return settings
+
+def to_async_url(url: str):
+    db_url = make_url(url)
+    query = db_url.query
+    params = {"ssl_mode": query.get("sslmode"), "server_settings": {}}
+    if query.get("connect_timeout"):
+        params["timeout"] = int(query["connect_timeout"])
+    if query.get("application_name"):
+        params["server_settings"]["application_name"] = query["application_name"]
+    if query.get("options"):
+        params["server_settings"].update(parse_pg_options(query["options"]))
+    dropped = [name for name in query if name not in ASYNCPG_QUERY_PARAMS]
+    db_url = db_url.set(drivername="postgresql+asyncpg").difference_update_query(dropped)
+    return db_url, params
+
+def get_async_engine(url: str):
+    if url not in _async_engines:
+        async_url, params = to_async_url(url)
+        connect_args = {"timeout": params.get("timeout", DB_CONNECT_TIMEOUT)}
+        if params["ssl_mode"] and params["ssl_mode"] != "disable":
+            connect_args["ssl"] = params["ssl_mode"]
+        server_settings = params["server_settings"]
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+        if server_settings:
+            connect_args["server_settings"] = server_settings
+
+        _async_engines[url] = create_async_engine(
+            async_url,
+            pool_size=DB_ASYNC_POOL_SIZE,
+            max_overflow=DB_ASYNC_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args=connect_args,
+        )
+    return _async_engines[url]
+
+def get_pool_status():
+    status = {f"sync:{url.split('@')[-1]}": engine.pool.status() for url, engine in _engines.items()}
+    status.update({f"async:{url.split('@')[-1]}": engine.pool.status() for url, engine in _async_engines.items()})
+    return status
+
+def is_read_only(clause):
+    if clause is None:
+        return False
+    sql = getattr(clause, "text", None)
+    if sql is None:
+        return bool(getattr(clause, "is_select", False))
+    sql = sql.lstrip().upper()
+    return sql.startswith("SELECT") and "FOR UPDATE" not in sql and "FOR SHARE" not in sql
+
+# sends plain SELECTs to a replica until the session writes (or is pinned),
+# after which everything stays on the primary for read-your-writes
+class RoutingSession(Session):
+    def __init__(self, *args, replicas=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas or []
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replicas and not self.info.get("pinned_primary"):
+            if is_read_only(clause):
+                return random.choice(self.replicas)
+            self.info["pinned_primary"] = True
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+def pin_to_primary(db):
+    # works for both Session and AsyncSession
+    session = getattr(db, "sync_session", db)
+    session.info["pinned_primary"] = True
+
+engine_main = get_engine(SQL_ALCHEMY_DB_URL)
+engine_users = get_engine(USERS_DB_URL)
+engine_students = get_engine(STUDENTS_DB_URL)
+
+read_engines = [get_engine(url) for url in READ_DB_URLS]
+users_read_engines = [get_engine(url) for url in USERS_READ_DB_URLS]
+students_read_engines = [get_engine(url) for url in STUDENTS_READ_DB_URLS]
+
+SessionLocalMain = sessionmaker(autocommit=False, autoflush=False, bind=engine_main, class_=RoutingSession, replicas=read_engines)
+SessionLocalUsers = sessionmaker(autocommit=False, autoflush=False, bind=engine_users, class_=RoutingSession, replicas=users_read_engines)
+SessionLocalStudents = sessionmaker(autocommit=False, autoflush=False, bind=engine_students, class_=RoutingSession, replicas=students_read_engines)
+
+async_engine_main = get_async_engine(SQL_ALCHEMY_DB_URL)
+async_engine_users = get_async_engine(USERS_DB_URL)
+async_engine_students = get_async_engine(STUDENTS_DB_URL)
+
+# AsyncSession routes through the sync session, so it needs the replicas' sync_engine
+async_read_engines = [get_async_engine(url).sync_engine for url in READ_DB_URLS]
+async_users_read_engines = [get_async_engine(url).sync_engine for url in USERS_READ_DB_URLS]
+async_students_read_engines = [get_async_engine(url).sync_engine for url in STUDENTS_READ_DB_URLS]
+
+AsyncSessionLocalMain = async_sessionmaker(async_engine_main, autoflush=False, expire_on_commit=False, sync_session_class=RoutingSession, replicas=async_read_engines)
+AsyncSessionLocalUsers = async_sessionmaker(async_engine_users, autoflush=False, expire_on_commit=False, sync_session_class=RoutingSession, replicas=async_users_read_engines)
+AsyncSessionLocalStudents = async_sessionmaker(async_engine_students, autoflush=False, expire_on_commit=False, sync_session_class=RoutingSession, replicas=async_students_read_engines)
 
 #base class for all sql_al models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
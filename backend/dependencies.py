@@ -1,4 +1,4 @@
-from database import SessionLocalMain, SessionLocalUsers, SessionLocalStudents
+from database import SessionLocalMain, SessionLocalUsers, SessionLocalStudents, AsyncSessionLocalMain, AsyncSessionLocalUsers, AsyncSessionLocalStudents
 
 def get_db_main():
     db_main = SessionLocalMain()
@@ -25,4 +25,17 @@ def get_db_students():
         yield db_students
     #Terminates session after completion
     finally:
-        db_students.close()
\ No newline at end of file
+        db_students.close()
+
+# async sessions for async def routes (asyncpg, no threadpool slot held)
+async def get_async_db_main():
+    async with AsyncSessionLocalMain() as db_main:
+        yield db_main
+
+async def get_async_db_users():
+    async with AsyncSessionLocalUsers() as db_users:
+        yield db_users
+
+async def get_async_db_students():
+    async with AsyncSessionLocalStudents() as db_students:
+        yield db_students
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+import os
+from fastapi.responses import StreamingResponse
+from dotenv import load_dotenv
+from database import SessionLocalMain
+
+load_dotenv()
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def encode_chunk(rows, export_format: str, write_header: bool) -> str:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if write_header:
+            writer.writerow(rows[0].keys())
+        writer.writerows(row.values() for row in rows)
+        return buffer.getvalue()
+    return "".join(json.dumps(dict(row), default=str) + "\n" for row in rows)
+
+# the generator owns its session: it outlives the request handler while the
+# response is streaming, so it can't borrow the get_db_* session
+def iter_export(fetch_chunks, export_format: str):
+    db = SessionLocalMain()
+    try:
+        first_chunk = True
+        for rows in fetch_chunks(db, EXPORT_CHUNK_SIZE):
+            if not rows:
+                continue
+            yield encode_chunk(rows, export_format, write_header=first_chunk)
+            first_chunk = False
+    finally:
+        db.close()
+
+def export_response(fetch_chunks, name: str, export_format: str) -> StreamingResponse:
+    return StreamingResponse(
+        iter_export(fetch_chunks, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
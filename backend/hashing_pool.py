@@ -0,0 +1,137 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from dotenv import load_dotenv
+import auth
+
+load_dotenv()
+
+# Password hashing/verification runs in a separate process pool so a login burst
+# burns those cores instead of the request threadpool and event loop. When more
+# than workers + HASH_POOL_MAX_QUEUE jobs are in flight new ones are refused with
+# a 503 straight away instead of queueing behind the burst.
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", os.cpu_count() or 2))
+HASH_POOL_MAX_QUEUE = int(os.getenv("HASH_POOL_MAX_QUEUE", 32))
+
+class HashPoolBusy(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Server is busy, please try again shortly", headers={"Retry-After": "1"})
+
+executor = None
+lock = threading.Lock()
+in_flight = 0
+metrics = {
+    "completed": 0,
+    "rejected": 0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+    "hash_seconds_total": 0.0,
+    "hash_seconds_max": 0.0,
+}
+
+# these run in the worker processes and report when they actually started
+def timed_hash(password: str):
+    started = time.time()
+    hashed = auth.hash_password(password)
+    return hashed, started, time.time() - started
+
+def timed_verify(password: str, hashed_password: str):
+    started = time.time()
+    valid = auth.verify_password(password, hashed_password)
+    return valid, started, time.time() - started
+
+def start():
+    global executor
+    with lock:
+        if executor is None:
+            # spawn: don't fork a process that already has threads, sockets and pools
+            # workers get the parent's (possibly calibrated) argon2 parameters
+            executor = ProcessPoolExecutor(
+                max_workers=HASH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=auth.configure_password_context,
+                initargs=(auth.argon2_params["time_cost"], auth.argon2_params["memory_cost"], auth.argon2_params["parallelism"]),
+            )
+    return executor
+
+def shutdown():
+    global executor
+    with lock:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+
+def reserve_slot():
+    global in_flight
+    with lock:
+        if in_flight >= HASH_POOL_WORKERS + HASH_POOL_MAX_QUEUE:
+            metrics["rejected"] += 1
+            raise HashPoolBusy()
+        in_flight += 1
+
+def release_slot(submitted: float, outcome):
+    global in_flight
+    with lock:
+        in_flight -= 1
+        if outcome is None:
+            return
+        _, started, hash_seconds = outcome
+        queue_seconds = max(0.0, started - submitted)
+        metrics["completed"] += 1
+        metrics["queue_seconds_total"] += queue_seconds
+        metrics["queue_seconds_max"] = max(metrics["queue_seconds_max"], queue_seconds)
+        metrics["hash_seconds_total"] += hash_seconds
+        metrics["hash_seconds_max"] = max(metrics["hash_seconds_max"], hash_seconds)
+
+def run_sync(func, *args):
+    reserve_slot()
+    submitted = time.time()
+    outcome = None
+    try:
+        outcome = start().submit(func, *args).result()
+        return outcome[0]
+    finally:
+        release_slot(submitted, outcome)
+
+async def run_async(func, *args):
+    reserve_slot()
+    submitted = time.time()
+    outcome = None
+    try:
+        outcome = await asyncio.get_running_loop().run_in_executor(start(), func, *args)
+        return outcome[0]
+    finally:
+        release_slot(submitted, outcome)
+
+# blocking versions for sync def code (crud.py, already in the threadpool)
+def hash_password(password: str) -> str:
+    return run_sync(timed_hash, password)
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return run_sync(timed_verify, password, hashed_password)
+
+# awaitable versions for async def code
+async def hash_password_async(password: str) -> str:
+    return await run_async(timed_hash, password)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await run_async(timed_verify, password, hashed_password)
+
+def get_metrics():
+    with lock:
+        completed = metrics["completed"]
+        return {
+            "workers": HASH_POOL_WORKERS,
+            "max_queue": HASH_POOL_MAX_QUEUE,
+            "in_flight": in_flight,
+            "completed": completed,
+            "rejected": metrics["rejected"],
+            "queue_ms_avg": round(1000 * metrics["queue_seconds_total"] / completed, 2) if completed else 0.0,
+            "queue_ms_max": round(1000 * metrics["queue_seconds_max"], 2),
+            "hash_ms_avg": round(1000 * metrics["hash_seconds_total"] / completed, 2) if completed else 0.0,
+            "hash_ms_max": round(1000 * metrics["hash_seconds_max"], 2),
+        }
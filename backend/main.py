@@ -1,28 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, BackgroundTasks
 #Depends allows to pass dependencies
 from sqlalchemy.orm import Session
-import models, schemas, crud
-from database import engine_main, engine_users
-from dependencies import get_db_main, get_db_users, get_db_students
+import models, schemas, crud, async_crud, arithmetic, reset_tokens
+from database import engine_main, engine_users, pin_to_primary, SessionLocalMain, get_pool_status
+from dependencies import get_db_main, get_db_users, get_db_students, get_async_db_main, get_async_db_users, get_async_db_students
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Body
 from fastapi.security import HTTPBearer
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 import json
 from auth import create_access_token
-from typing import List
+from typing import List, Optional, Literal
 import logging
-from collections import defaultdict
 from datetime import datetime
-from auth import (create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES)
-from auth import validate_usn_field, sanitize_usn, get_client_ip, is_rate_limited, validate_email, record_failed_attempt, sanitize_input, validate_name_field, validate_password_strength, hash_sensitive_data, create_password_reset_token, verify_password_reset_token
+from auth import (create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, load_argon2_params, token_cache)
+from auth import validate_usn_field, sanitize_usn, get_client_ip, validate_email, sanitize_input, validate_name_field, validate_password_strength, hash_sensitive_data, create_password_reset_token, verify_password_reset_token
 from email_service import send_password_change_confirmation, send_password_reset_email
 from middleware.blacklist_token import TokenBlocklistMiddleware
+from middleware.rate_limit import RateLimitMiddleware
 from routes.user import user_router
 from routes.students import student_router
 from routes.faculties import faculty_router
 import rate_limit
+from export import export_response
+from cache import cached_page, content_cache, invalidate_cache
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, set_next_cursor
 from redis_connxn import r
+from circuit_breaker import redis_breaker
+from contextlib import asynccontextmanager
+from maintenance import scheduler, MAINTENANCE_ENABLED
+import hashing_pool
+from hashing_pool import HashPoolBusy
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,21 +43,28 @@ logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
-login_attempts = defaultdict(list)
-blocked_ips = defaultdict(float)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(load_argon2_params, r)
+    hashing_pool.start()
+    if MAINTENANCE_ENABLED:
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    hashing_pool.shutdown()
 
-MAX_LOGIN_ATTEMPTS = 5
-BLOCK_DURATION = 900
-ATTEMPT_WINDOW = 300
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+# added before CORS so 429s still carry the CORS headers
+app.add_middleware(RateLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "https://user-management-lovat.vercel.app", "https://student-portal-pearl.vercel.app"],  # Allow all origins
     allow_credentials=True,
     allow_headers=["*"],
-    allow_methods=["*"]
+    allow_methods=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"]
 )
 
 app.add_middleware(TokenBlocklistMiddleware)
@@ -57,27 +75,52 @@ app.include_router(faculty_router, prefix="/api")
 
 #Create db tables if they don't exist
 models.Base.metadata.create_all(bind=engine_main)
-models.Base.metadata.create_all(bind=engine_users)
+if engine_users is not engine_main:
+    models.Base.metadata.create_all(bind=engine_users)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to FastAPI!"}
 
 @app.post("/users", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db_main)):
-    user = crud.create_user(db=db, user=user)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db_main)):
+    user = await async_crud.create_user(db=db, user=user)
     return user
 
+@app.post('/users/bulk', response_model=schemas.BulkResponse)
+def bulk_create_users(users: List[schemas.UserCreate], db: Session = Depends(get_db_main)):
+    return crud.bulk_create_users(db, users)
+
+@app.patch('/users/bulk', response_model=schemas.BulkResponse)
+def bulk_update_users(users: List[schemas.UserBulkUpdate], db: Session = Depends(get_db_main)):
+    return crud.bulk_update_users(db, users)
+
+# declared before DELETE /users/{user_id} so "bulk" isn't parsed as an id
+@app.delete('/users/bulk', response_model=schemas.BulkResponse)
+def bulk_delete_users(payload: schemas.UserBulkDelete, db: Session = Depends(get_db_main)):
+    return crud.bulk_delete_users(db, payload.ids)
+
+# declared before /users/{user_id} so "export" isn't parsed as an id
+@app.get("/users/export")
+def export_users(format: Literal["ndjson", "csv"] = "ndjson"):
+    return export_response(crud.stream_users, "users", format)
+
 @app.get("/users/{user_id}", response_model=schemas.UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db_main)):
-    user = crud.get_user(db, user_id)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_async_db_main)):
+    user = await async_crud.get_user(db, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @app.get('/users', response_model=List[schemas.UserResponse])
-def get_all_users(db: Session = Depends(get_db_main)):
-    users = crud.get_all_users(db)
+async def get_all_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db_main)
+):
+    users, next_cursor = await async_crud.get_all_users(db, decode_cursor(cursor), limit)
+    set_next_cursor(response, next_cursor)
     return users
 
 @app.put('/users/{user_id}', response_model=schemas.UserResponse)
@@ -104,10 +147,11 @@ def register(user: schemas.ClientCreate, request: Request, db: Session = Depends
     
     client_ip = get_client_ip(request)
     
-    is_limited, limit_message = is_rate_limited(client_ip)
-    if is_limited:
+    try:
+        rate_limit.check_register_rate_limit(client_ip, r)
+    except HTTPException:
         logger.warning(f"Registration rate limit exceeded for IP: {client_ip}")
-        raise HTTPException(status_code=429, detail=limit_message)
+        raise
     
     try:
         if not user.email or not user.password or not user.firstname or not user.lastname:
@@ -124,19 +168,19 @@ def register(user: schemas.ClientCreate, request: Request, db: Session = Depends
         
         if not validate_email(sanitized_email):
             logger.warning(f"Invalid email format in registration from IP: {client_ip}")
-            record_failed_attempt(client_ip)  # Count as failed attempt
+            rate_limit.record_register_failed_attempt(client_ip, r)  # Count as failed attempt
             raise HTTPException(status_code=400, detail="Invalid email format")
         
         if not validate_name_field(sanitized_firstname, "First name"):
-            record_failed_attempt(client_ip)
+            rate_limit.record_register_failed_attempt(client_ip, r)
             raise HTTPException(status_code=400, detail="Invalid first name")
             
         if not validate_name_field(sanitized_lastname, "Last name"):
-            record_failed_attempt(client_ip)
+            rate_limit.record_register_failed_attempt(client_ip, r)
             raise HTTPException(status_code=400, detail="Invalid last name")
         
         if not validate_password_strength(sanitized_password):
-            record_failed_attempt(client_ip)
+            rate_limit.record_register_failed_attempt(client_ip, r)
             raise HTTPException(
                 status_code=400, 
                 detail="Password must be at least 8 characters with uppercase, lowercase, number, and special character"
@@ -155,8 +199,7 @@ def register(user: schemas.ClientCreate, request: Request, db: Session = Depends
         
         logger.info(f"Successful registration for user ID: {new_client.id} from IP: {client_ip}")
         
-        if client_ip in login_attempts:
-            login_attempts[client_ip] = []
+        rate_limit.reset_register_attempts(client_ip, r)
         
         return new_client
         
@@ -170,20 +213,20 @@ def register(user: schemas.ClientCreate, request: Request, db: Session = Depends
         )
 
 @app.post('/login')
-def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_db_users)):
+async def login(user: schemas.UserLogin, request: Request, db: AsyncSession = Depends(get_async_db_users)):
     
     client_ip = get_client_ip(request)
+    limit_info = None
     print(f"[LOGIN] Starting login for IP: {client_ip}")
     
     try:
         print(f"[LOGIN] Checking rate limit for IP: {client_ip}")
-        rate_limit.check_client_rate_limit(client_ip, r)
+        limit_info = await run_in_threadpool(rate_limit.check_client_rate_limit, client_ip, r)
         print(f"[LOGIN] Rate limit check passed for IP: {client_ip}")
         
         if not user.email or not user.password:
             print(f"[LOGIN] Missing credentials for IP: {client_ip}")
-            rate_limit.record_client_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400,
                 detail=f"Email and password are required. {remaining} attempts remaining."
@@ -194,8 +237,7 @@ def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_d
         
         if not validate_email(sanitized_email):
             print(f"[LOGIN] Invalid email format for IP: {client_ip}")
-            rate_limit.record_client_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid email format. {remaining} attempts remaining."
@@ -209,13 +251,17 @@ def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_d
         )
         
         try:
-            authenticated = crud.authenticate_client(db, sanitized_user)
+            authenticated = await async_crud.authenticate_client(db, sanitized_user)
             print(f"[LOGIN] Authentication successful: {authenticated}")
             
+        except HashPoolBusy:
+            # the password was never checked, give the reserved attempt back
+            await run_in_threadpool(rate_limit.release_client_attempt, client_ip, r)
+            raise
+
         except HTTPException as auth_error:
             print(f"[LOGIN] Authentication failed for IP: {client_ip} - {auth_error.detail}")
-            rate_limit.record_client_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             
             raise HTTPException(
                 status_code=401,
@@ -224,8 +270,7 @@ def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_d
         
         if not authenticated:
             print(f"[LOGIN] Authentication returned False for IP: {client_ip}")
-            rate_limit.record_client_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             
             raise HTTPException(
                 status_code=401,
@@ -233,7 +278,7 @@ def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_d
             )
         
         print(f"[LOGIN] Authentication successful for IP: {client_ip}")
-        rate_limit.reset_failed_attempts(client_ip, r)
+        await run_in_threadpool(rate_limit.reset_failed_attempts, client_ip, r)
         
         access_token = create_access_token(data={"sub": authenticated.id})
         
@@ -286,8 +331,7 @@ def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_d
         
     except Exception as e:
         print(f"[LOGIN] Unexpected error for IP: {client_ip}: {e}")
-        rate_limit.record_failed_attempt_redis(client_ip, r)
-        remaining = rate_limit.get_remaining_attempts(client_ip, r)
+        remaining = limit_info["remaining"] if limit_info else 0
         
         raise HTTPException(
             status_code=500,
@@ -298,17 +342,17 @@ def login(user: schemas.UserLogin, request: Request, db: Session = Depends(get_d
 def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session = Depends(get_db_users)):
     
     client_ip = get_client_ip(request)
+    limit_info = None
     print(f"[FORGOT_PASSWORD] Starting forgot password for IP: {client_ip}")
     
     try:
         print(f"[FORGOT_PASSWORD] Checking rate limit for IP: {client_ip}")
-        rate_limit.check_forgot_password_rate_limit(client_ip, r)
+        limit_info = rate_limit.check_forgot_password_rate_limit(client_ip, r)
         print(f"[FORGOT_PASSWORD] Rate limit check passed for IP: {client_ip}")
         
         if not user.email:
             print(f"[FORGOT_PASSWORD] Missing email for IP: {client_ip}")
-            rate_limit.record_forgot_password_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_forgot_password_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400,
                 detail=f"Email is required. {remaining} attempts remaining."
@@ -318,8 +362,7 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
         
         if not validate_email(sanitized_email):
             print(f"[FORGOT_PASSWORD] Invalid email format for IP: {client_ip}")
-            rate_limit.record_forgot_password_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_forgot_password_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid email format. {remaining} attempts remaining."
@@ -332,8 +375,7 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
             
             if not user_exists:
                 print(f"[FORGOT_PASSWORD] User not found for IP: {client_ip}")
-                rate_limit.record_forgot_password_failed_attempt(client_ip, r)
-                remaining = rate_limit.get_forgot_password_remaining_attempts(client_ip, r)
+                remaining = limit_info["remaining"]
                 
                 raise HTTPException(
                     status_code=404,
@@ -344,7 +386,7 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
             
             reset_token = create_password_reset_token(user_exists.id, sanitized_email)
             
-            crud.store_password_reset_token(db, user_exists.id, reset_token)
+            reset_tokens.store_reset_token(db, user_exists.id, reset_token)
             
             try:
                 send_password_reset_email(sanitized_email, reset_token, user_exists.firstname)
@@ -352,7 +394,7 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
             except Exception as email_error:
                 print(f"[FORGOT_PASSWORD] Failed to send email to {sanitized_email}: {str(email_error)}")
                 # Clean up the token if email fails
-                crud.delete_reset_token(db, user_exists.id, reset_token)
+                reset_tokens.discard_reset_token(db, user_exists.id, reset_token)
                 raise HTTPException(
                     status_code=500,
                     detail="Failed to send password reset email. Please try again later."
@@ -363,7 +405,6 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
             
         except HTTPException as auth_error:
             print(f"[FORGOT_PASSWORD] Process failed for IP: {client_ip} - {auth_error.detail}")
-            remaining = rate_limit.get_forgot_password_remaining_attempts(client_ip, r)
             
             raise HTTPException(
                 status_code=auth_error.status_code,
@@ -385,8 +426,7 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
         
     except Exception as e:
         print(f"[FORGOT_PASSWORD] Unexpected error for IP: {client_ip}: {e}")
-        rate_limit.record_forgot_password_failed_attempt(client_ip, r)
-        remaining = rate_limit.get_forgot_password_remaining_attempts(client_ip, r)
+        remaining = limit_info["remaining"] if limit_info else 0
         
         raise HTTPException(
             status_code=500,
@@ -398,17 +438,19 @@ def forgot_password(user: schemas.ForgotPassword, request: Request, db: Session
 def reset_password(reset_data: schemas.ResetPassword, request: Request, db: Session = Depends(get_db_users)):
     
     client_ip = get_client_ip(request)
+    limit_info = None
     print(f"[RESET_PASSWORD] Starting password reset for IP: {client_ip}")
+    # the reset token was written by an earlier request, don't read it from a lagging replica
+    pin_to_primary(db)
     
     try:
         print(f"[RESET_PASSWORD] Checking rate limit for IP: {client_ip}")
-        rate_limit.check_client_rate_limit(client_ip, r)
+        limit_info = rate_limit.check_client_rate_limit(client_ip, r)
         print(f"[RESET_PASSWORD] Rate limit check passed for IP: {client_ip}")
         
         if not reset_data.token or not reset_data.new_password:
             print(f"[RESET_PASSWORD] Missing required fields for IP: {client_ip}")
-            rate_limit.record_client_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400,
                 detail=f"Token and new password are required. {remaining} attempts remaining."
@@ -420,8 +462,7 @@ def reset_password(reset_data: schemas.ResetPassword, request: Request, db: Sess
         # Validate password strength
         if not validate_password_strength(sanitized_password):
             print(f"[RESET_PASSWORD] Weak password for IP: {client_ip}")
-            rate_limit.record_client_failed_attempt(client_ip, r)
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400, 
                 detail=f"Password must be at least 8 characters with uppercase, lowercase, number, and special character. {remaining} attempts remaining."
@@ -433,37 +474,28 @@ def reset_password(reset_data: schemas.ResetPassword, request: Request, db: Sess
             # Verify reset token
             token_data = verify_password_reset_token(sanitized_token)
             user_id = token_data.get("user_id")
-            user_email = token_data.get("email")
             
             if not user_id:
                 print(f"[RESET_PASSWORD] Invalid token structure for IP: {client_ip}")
-                rate_limit.record_client_failed_attempt(client_ip, r)
-                remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+                remaining = limit_info["remaining"]
                 
                 raise HTTPException(
                     status_code=400,
                     detail=f"Invalid reset token. {remaining} attempts remaining."
                 )
             
-            # Check if token exists in database and is not expired
-            token_valid = crud.verify_reset_token(db, user_id, sanitized_token)
+            # Consume the token and set the new password in one transaction
+            user_details = reset_tokens.reset_password(db, user_id, sanitized_token, sanitized_password)
             
-            if not token_valid:
+            if not user_details:
                 print(f"[RESET_PASSWORD] Token expired or invalid for IP: {client_ip}")
-                rate_limit.record_client_failed_attempt(client_ip, r)
-                remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
+                remaining = limit_info["remaining"]
                 
                 raise HTTPException(
                     status_code=400,
                     detail=f"Reset token has expired or is invalid. {remaining} attempts remaining."
                 )
             
-            user_details = crud.get_user_by_email(db, user_email)
-            
-            crud.update_user_password(db, user_id, sanitized_password)
-            
-            crud.delete_reset_token(db, user_id, sanitized_token)
-            
             # Send password change confirmation email (optional)
             if user_details:
                 try:
@@ -478,7 +510,6 @@ def reset_password(reset_data: schemas.ResetPassword, request: Request, db: Sess
             
         except HTTPException as auth_error:
             print(f"[RESET_PASSWORD] Process failed for IP: {client_ip} - {auth_error.detail}")
-            remaining = rate_limit.get_client_remaining_attempts(client_ip, r)
             
             raise HTTPException(
                 status_code=auth_error.status_code,
@@ -500,29 +531,57 @@ def reset_password(reset_data: schemas.ResetPassword, request: Request, db: Sess
         
     except Exception as e:
         print(f"[RESET_PASSWORD] Unexpected error for IP: {client_ip}: {e}")
-        rate_limit.record_failed_attempt_redis(client_ip, r)
-        remaining = rate_limit.get_remaining_attempts(client_ip, r)
+        remaining = limit_info["remaining"] if limit_info else 0
         
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error. {remaining} attempts remaining."
         )
         
+# ARITHMETIC_BACKEND=db (the default) calls the postgres functions, python computes in-process
 @app.get('/square/{number}')
 def get_square(number: int, db: Session = Depends(get_db_main)):
-    return crud.get_square(db, number)
+    if arithmetic.use_database():
+        return crud.get_square(db, number)
+    return arithmetic.get_square(number)
 
 @app.post('/add_numbers')
 def add_numbers(num: schemas.AddNumbers, db:Session = Depends(get_db_main)):
-    return crud.add_number(db, num.a, num.b)
+    if arithmetic.use_database():
+        return crud.add_number(db, num.a, num.b)
+    return arithmetic.add_number(num.a, num.b)
 
 @app.post('/celsius_to_fahrenheit')
 def celsius_to_fahrenheit(temperature: schemas.ToFarenheit, db: Session = Depends(get_db_main)):
-    return crud.celsius_to_farenheit(db, temperature.celsius)
+    if arithmetic.use_database():
+        return crud.celsius_to_farenheit(db, temperature.celsius)
+    return arithmetic.celsius_to_farenheit(temperature.celsius)
 
 @app.get('/check_even_odd/{number}')
 def check_even_odd(number: int, db: Session = Depends(get_db_main)):
-    return crud.check_even_odd(db, number)
+    if arithmetic.use_database():
+        return crud.check_even_odd(db, number)
+    return arithmetic.check_even_odd(number)
+
+@app.post('/arithmetic/batch')
+def arithmetic_batch(batch: schemas.ArithmeticBatch, db: Session = Depends(get_db_main)):
+    # same cap as the other batch endpoints, across all four vectors together
+    crud.check_bulk_size(batch.square + batch.add_numbers + batch.celsius_to_fahrenheit + batch.check_even_odd)
+    a = [num.a for num in batch.add_numbers]
+    b = [num.b for num in batch.add_numbers]
+    if arithmetic.use_database():
+        return {
+            "square": crud.get_square_many(db, batch.square) if batch.square else [],
+            "sum": crud.add_numbers_many(db, a, b) if a else [],
+            "farenheit": crud.celsius_to_farenheit_many(db, batch.celsius_to_fahrenheit) if batch.celsius_to_fahrenheit else [],
+            "result": crud.check_even_odd_many(db, batch.check_even_odd) if batch.check_even_odd else [],
+        }
+    return {
+        "square": arithmetic.square_many(batch.square),
+        "sum": arithmetic.add_many(a, b),
+        "farenheit": arithmetic.celsius_to_farenheit_many(batch.celsius_to_fahrenheit),
+        "result": arithmetic.even_odd_many(batch.check_even_odd),
+    }
 
 @app.get('/high_salary_employees/{salary_threshold}')
 def high_salary_employees(salary_threshold: int, db: Session = Depends(get_db_main)):
@@ -535,6 +594,16 @@ def get_employee_salary(emp_id: int, db: Session = Depends(get_db_main)):
         raise HTTPException(status_code=404, detail="Employee not found")
     return employee
 
+@app.get('/calculate_bonus')
+def calculate_bonuses(
+    ids: Optional[List[int]] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    bonuses, next_cursor = crud.calculate_bonuses(db, ids, decode_cursor(cursor), limit)
+    return {"bonuses": bonuses, "next_cursor": next_cursor}
+
 @app.get('/calculate_bonus/{emp_id}')
 def calculate_bonus(emp_id: int, db: Session = Depends(get_db_main)):
     bonus = crud.calculate_bonus(db, emp_id)
@@ -542,10 +611,36 @@ def calculate_bonus(emp_id: int, db: Session = Depends(get_db_main)):
         raise HTTPException(status_code=404, detail="Employee not found")
     return bonus
 
+SALARY_STATS_CACHE = "salary_stats"
+
+# cached in the content cache until a salary write invalidates it
+@app.get('/salary_stats')
+def salary_stats(
+    percentiles: List[float] = Query([0.25, 0.5, 0.75, 0.9]),
+    edges: Optional[List[float]] = Query(None),
+    buckets: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db_main)
+):
+    if any(p < 0 or p > 1 for p in percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 1")
+    if edges and any(low >= high for low, high in zip(edges, edges[1:])):
+        raise HTTPException(status_code=400, detail="Bucket edges must be strictly increasing")
+
+    key = f"{SALARY_STATS_CACHE}:{percentiles}:{edges}:{buckets}"
+    def load():
+        stats = crud.get_salary_stats(db, percentiles, edges, buckets)
+        return json.dumps(jsonable_encoder(stats)).encode()
+    # redis only: cached until the next salary write, on every worker
+    return Response(content=content_cache.get_or_load(SALARY_STATS_CACHE, key, load, use_local=False), media_type="application/json")
+
 @app.get('/list_employees')
-def list_employees(db: Session = Depends(get_db_main)):
-    employees = crud.list_employees(db)
-    return {"employees": employees}
+def list_employees(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    employees, next_cursor = crud.list_employees(db, decode_cursor(cursor), limit)
+    return {"employees": employees, "next_cursor": next_cursor}
 
 # @app.put('/update_salary/{emp_id}')
 # def update_employee_salary(emp_id: int, salary_update: schemas.SalaryUpdate, db: Session = Depends(get_db_main)):
@@ -553,6 +648,13 @@ def list_employees(db: Session = Depends(get_db_main)):
 #         raise HTTPException(status_code=400, detail="Salary cannot be negative")
 #     return crud.update_salary(db, emp_id, salary_update.new_salary)
 
+# declared before /update_salary/{emp_id} so "bulk" isn't parsed as an id
+@app.put('/update_salary/bulk')
+def bulk_update_employee_salary(updates: List[schemas.SalaryBulkUpdateItem], db: Session = Depends(get_db_main)):
+    result = crud.bulk_update_salary(db, updates)
+    invalidate_cache(SALARY_STATS_CACHE)
+    return result
+
 @app.put('/update_salary/{emp_id}')
 def update_employee_salary(
     emp_id: int,
@@ -561,47 +663,140 @@ def update_employee_salary(
 ):
     if salary_update.new_salary < 0:
         raise HTTPException(status_code=400, detail="Salary cannot be negative")
-    return crud.update_salary(db, emp_id, salary_update.new_salary)
+    result = crud.update_salary(db, emp_id, salary_update.new_salary)
+    invalidate_cache(SALARY_STATS_CACHE)
+    return result
 
 @app.get('/get_salary_logs')
-def fetch_salary_logs(db: Session = Depends(get_db_main)):
-    return crud.get_salary_logs(db)
+def fetch_salary_logs(
+    response: Response,
+    emp_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    order: Literal["asc", "desc"] = "desc",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    logs, next_cursor = crud.get_salary_logs(db, emp_id, start, end, order, cursor, limit)
+    set_next_cursor(response, next_cursor)
+    return logs
+
+@app.get('/salary_logs/export')
+def export_salary_logs(format: Literal["ndjson", "csv"] = "ndjson"):
+    return export_response(crud.stream_salary_logs, "salary_logs", format)
 
-#To get updated salary employee with id
-# @app.get('/get_salary_logs/{emp_id}')
-# def fetch_salary_logs(emp_id: int, db: Session = Depends(get_db_main)):
-#     return crud.get_salary_logs(db, emp_id)
 
 @app.post('/add_employee')
 def add_employee(employee: schemas.AddEmployee, db: Session = Depends(get_db_main)):
     if employee.emp_salary < 0:
         raise HTTPException(status_code=400, detail="Salary cannot be negative")
-    return crud.add_employee(db, employee.emp_name, employee.emp_salary)
+    result = crud.add_employee(db, employee.emp_name, employee.emp_salary)
+    invalidate_cache(SALARY_STATS_CACHE)
+    return result
+
+# background runs outlive the request, so they get their own session
+def run_salary_increase_in_background(run_id: int):
+    db = SessionLocalMain()
+    try:
+        crud.run_salary_increase(db, run_id)
+    finally:
+        db.close()
+        invalidate_cache(SALARY_STATS_CACHE)
 
 @app.post('/increase_all_salaries')
-def increase_all_salaries(increase: schemas.SalaryIncrease, db: Session = Depends(get_db_main)):
+def increase_all_salaries(increase: schemas.SalaryIncrease, background_tasks: BackgroundTasks, db: Session = Depends(get_db_main)):
     if increase.increase_percent< 0:
         raise HTTPException(status_code=400, detail="Increase percent cannot be negative")
-    return crud.increase_all_salaries(db, increase.increase_percent)
+    if not increase.chunked:
+        result = crud.increase_all_salaries(db, increase.increase_percent)
+        invalidate_cache(SALARY_STATS_CACHE)
+        return result
+
+    chunk_size = increase.chunk_size or crud.SALARY_INCREASE_CHUNK_SIZE
+    if chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="Chunk size must be positive")
+    run_id = crud.start_salary_increase_run(db, increase.increase_percent, chunk_size)
+    background_tasks.add_task(run_salary_increase_in_background, run_id)
+    return {"message": f"Salary increase of {increase.increase_percent}% started", "run_id": run_id, "chunk_size": chunk_size}
+
+@app.get('/increase_all_salaries/runs/{run_id}')
+def salary_increase_status(run_id: int, db: Session = Depends(get_db_main)):
+    return crud.get_salary_increase_run(db, run_id)
+
+@app.post('/increase_all_salaries/runs/{run_id}/resume')
+def resume_salary_increase(run_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db_main)):
+    crud.resume_salary_increase_run(db, run_id)
+    background_tasks.add_task(run_salary_increase_in_background, run_id)
+    return {"message": f"Salary increase run {run_id} resumed", "run_id": run_id}
 
 @app.get("/testing", response_model=List[schemas.TestingSchema])
-def read_testing(db: Session = Depends(get_db_main)):
-    return crud.get_all_testing(db)
+def read_testing(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    return cached_page("testing", crud.get_all_testing, db, cursor, limit)
 
 
 @app.get("/testingtwo", response_model=List[schemas.TestingTwoSchema])
-def read_testingtwo(db: Session = Depends(get_db_main)):
-    return crud.get_all_testingtwo(db)
+def read_testingtwo(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    return cached_page("testingtwo", crud.get_all_testingtwo, db, cursor, limit)
 
 
 @app.get("/insights", response_model=List[schemas.InsightsSchema])
-def read_insights(db: Session = Depends(get_db_main)):
-    return crud.get_all_insights(db)
+def read_insights(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    return cached_page("insights", crud.get_all_insights, db, cursor, limit)
 
 
 @app.get("/communities", response_model=List[schemas.CommunitiesSchema])
-def read_communities(db: Session = Depends(get_db_main)):
-    return crud.get_all_communities(db)
+def read_communities(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_main)
+):
+    return cached_page("communities", crud.get_all_communities, db, cursor, limit)
+
+@app.get('/metrics/db-pool')
+def db_pool_metrics():
+    return get_pool_status()
+
+@app.get('/metrics/hashing')
+def hashing_metrics():
+    return hashing_pool.get_metrics()
+
+@app.get('/health/redis')
+def redis_health():
+    return redis_breaker.get_stats()
+
+@app.get('/metrics/token-cache')
+def token_cache_metrics():
+    return token_cache.get_stats()
+
+@app.get('/maintenance/stats')
+def maintenance_stats():
+    return scheduler.get_stats()
+
+CACHED_CONTENT = ("testing", "testingtwo", "insights", "communities")
+
+@app.get('/cache/stats')
+def cache_stats():
+    return content_cache.get_stats()
+
+@app.post('/cache/invalidate/{name}')
+def invalidate_content_cache(name: str):
+    if name not in CACHED_CONTENT:
+        raise HTTPException(status_code=404, detail=f"Unknown cache {name}")
+    invalidate_cache(name)
+    return {"message": f"Cache {name} invalidated"}
 
 
 @app.post('/students-register', response_model=schemas.StudentResponse)
@@ -609,10 +804,11 @@ def register(student: schemas.StudentCreate, request: Request, db: Session = Dep
     
     student_ip = get_client_ip(request)
     
-    is_limited, limit_message = is_rate_limited(student_ip)
-    if is_limited:
+    try:
+        rate_limit.check_register_rate_limit(student_ip, r)
+    except HTTPException:
         logger.warning(f"Registration rate limit exceeded for IP: {student_ip}")
-        raise HTTPException(status_code=429, detail=limit_message)
+        raise
     
     try:
         if not student.email or not student.password or not student.name or not student.usn:
@@ -629,19 +825,19 @@ def register(student: schemas.StudentCreate, request: Request, db: Session = Dep
         
         if not validate_email(sanitized_email):
             logger.warning(f"Invalid email format in registration from IP: {student_ip}")
-            record_failed_attempt(student_ip)  # Count as failed attempt
+            rate_limit.record_register_failed_attempt(student_ip, r)  # Count as failed attempt
             raise HTTPException(status_code=400, detail="Invalid email format")
         
         if not validate_name_field(sanitized_name, "Name"):
-            record_failed_attempt(student_ip)
+            rate_limit.record_register_failed_attempt(student_ip, r)
             raise HTTPException(status_code=400, detail="Invalid name")
             
         if not validate_usn_field(sanitized_usn, "Usn"):
-            record_failed_attempt(student_ip)
+            rate_limit.record_register_failed_attempt(student_ip, r)
             raise HTTPException(status_code=400, detail="Invalid usn")
         
         if not validate_password_strength(sanitized_password):
-            record_failed_attempt(student_ip)
+            rate_limit.record_register_failed_attempt(student_ip, r)
             raise HTTPException(
                 status_code=400, 
                 detail="Password must be at least 8 characters with uppercase, lowercase, number, and special character"
@@ -660,8 +856,7 @@ def register(student: schemas.StudentCreate, request: Request, db: Session = Dep
         
         logger.info(f"Successful registration for user ID: {new_student.id} from IP: {student_ip}")
         
-        if student_ip in login_attempts:
-            login_attempts[student_ip] = []
+        rate_limit.reset_register_attempts(student_ip, r)
         
         return new_student
         
@@ -675,27 +870,23 @@ def register(student: schemas.StudentCreate, request: Request, db: Session = Dep
         )
 
 @app.post('/students-login')
-def login(user: schemas.StudentLogin, request: Request, db: Session = Depends(get_db_students)):
+async def login(user: schemas.StudentLogin, request: Request, db: AsyncSession = Depends(get_async_db_students)):
     
     student_ip = get_client_ip(request)
+    limit_info = None
     print(f"[STUDENT-LOGIN] Starting login for IP: {student_ip}")
     
     try:
         print(f"[STUDENT-LOGIN] Checking rate limit for IP: {student_ip}")
         
-        is_limited, limit_message = is_rate_limited(student_ip)
-        if is_limited:
-            print(f"[STUDENT-LOGIN] Rate limit exceeded for IP: {student_ip}")
-            logger.warning(f"Rate limit exceeded for IP: {student_ip}")
-            raise HTTPException(status_code=429, detail=limit_message)
+        limit_info = await run_in_threadpool(rate_limit.check_student_rate_limit, student_ip, r)
         
         print(f"[STUDENT-LOGIN] Rate limit check passed for IP: {student_ip}")
         
         if not user.email or not user.password:
             print(f"[STUDENT-LOGIN] Missing credentials for IP: {student_ip}")
             logger.warning(f"Login attempt with missing credentials from IP: {student_ip}")
-            rate_limit.record_student_failed_attempt(student_ip, r)
-            remaining_attempts = rate_limit.get_student_remaining_attempts(student_ip, r)  # You may need to implement this
+            remaining_attempts = limit_info["remaining"]
             raise HTTPException(
                 status_code=400,
                 detail=f"Email and password are required. {remaining_attempts} attempts remaining."
@@ -707,8 +898,7 @@ def login(user: schemas.StudentLogin, request: Request, db: Session = Depends(ge
         if not validate_email(sanitized_email):
             print(f"[STUDENT-LOGIN] Invalid email format for IP: {student_ip}")
             logger.warning(f"Invalid email format attempted from IP: {student_ip}")
-            rate_limit.record_student_failed_attempt(student_ip, r)
-            remaining_attempts = rate_limit.get_student_remaining_attempts(student_ip, r)
+            remaining_attempts = limit_info["remaining"]
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid email format. {remaining_attempts} attempts remaining."
@@ -723,13 +913,17 @@ def login(user: schemas.StudentLogin, request: Request, db: Session = Depends(ge
         )
         
         try:
-            authenticated = crud.authenticate_student(db, sanitized_student)
+            authenticated = await async_crud.authenticate_student(db, sanitized_student)
             print(f"[STUDENT-LOGIN] Authentication successful: {authenticated}")
             
+        except HashPoolBusy:
+            # the password was never checked, give the reserved attempt back
+            await run_in_threadpool(rate_limit.release_student_attempt, student_ip, r)
+            raise
+
         except HTTPException as auth_error:
             print(f"[STUDENT-LOGIN] Authentication failed for IP: {student_ip} - {auth_error.detail}")
-            rate_limit.record_student_failed_attempt(student_ip, r)
-            remaining_attempts = rate_limit.get_student_remaining_attempts(student_ip, r)
+            remaining_attempts = limit_info["remaining"]
             logger.warning(
                 f"Failed login attempt for email hash: {hash_sensitive_data(sanitized_email)} "
                 f"from IP: {student_ip}"
@@ -742,8 +936,7 @@ def login(user: schemas.StudentLogin, request: Request, db: Session = Depends(ge
         
         if not authenticated:
             print(f"[STUDENT-LOGIN] Authentication returned False for IP: {student_ip}")
-            rate_limit.record_student_failed_attempt(student_ip, r)
-            remaining_attempts = rate_limit.get_student_remaining_attempts(student_ip, r)
+            remaining_attempts = limit_info["remaining"]
             logger.warning(
                 f"Failed login attempt for email hash: {hash_sensitive_data(sanitized_email)} "
                 f"from IP: {student_ip}"
@@ -755,10 +948,7 @@ def login(user: schemas.StudentLogin, request: Request, db: Session = Depends(ge
             )
         
         print(f"[LOGIN] Authentication successful for IP: {student_ip}")
-        rate_limit.reset_failed_attempts(student_ip, r)
-        
-        if student_ip in login_attempts:
-            login_attempts[student_ip] = []
+        await run_in_threadpool(rate_limit.reset_student_failed_attempts, student_ip, r)
             
         
         access_token = create_access_token(data={"sub": authenticated.id})
@@ -811,8 +1001,7 @@ def login(user: schemas.StudentLogin, request: Request, db: Session = Depends(ge
     except Exception as e:
         print(f"[STUDENT-LOGIN] Unexpected error for IP: {student_ip}: {e}")
         logger.error(f"Unexpected login error for IP: {student_ip}, Error: {str(e)}", exc_info=True)
-        rate_limit.record_student_failed_attempt(student_ip, r)
-        remaining_attempts = rate_limit.get_student_remaining_attempts(student_ip, r)
+        remaining_attempts = limit_info["remaining"] if limit_info else 0
         
         raise HTTPException(
             status_code=500,
@@ -824,10 +1013,11 @@ def register(faculty: schemas.FacultyCreate, request: Request, db: Session = Dep
     
     faculty_ip = get_client_ip(request)
     
-    is_limited, limit_message = is_rate_limited(faculty_ip)
-    if is_limited:
+    try:
+        rate_limit.check_register_rate_limit(faculty_ip, r)
+    except HTTPException:
         logger.warning(f"Registration rate limit exceeded for IP: {faculty_ip}")
-        raise HTTPException(status_code=429, detail=limit_message)
+        raise
     
     try:
         if not faculty.email or not faculty.password or not faculty.name:
@@ -843,15 +1033,15 @@ def register(faculty: schemas.FacultyCreate, request: Request, db: Session = Dep
         
         if not validate_email(sanitized_email):
             logger.warning(f"Invalid email format in registration from IP: {faculty_ip}")
-            record_failed_attempt(faculty_ip)  # Count as failed attempt
+            rate_limit.record_register_failed_attempt(faculty_ip, r)  # Count as failed attempt
             raise HTTPException(status_code=400, detail="Invalid email format")
         
         if not validate_name_field(sanitized_name, "Name"):
-            record_failed_attempt(faculty_ip)
+            rate_limit.record_register_failed_attempt(faculty_ip, r)
             raise HTTPException(status_code=400, detail="Invalid name")
         
         if not validate_password_strength(sanitized_password):
-            record_failed_attempt(faculty_ip)
+            rate_limit.record_register_failed_attempt(faculty_ip, r)
             raise HTTPException(
                 status_code=400, 
                 detail="Password must be at least 8 characters with uppercase, lowercase, number, and special character"
@@ -869,8 +1059,7 @@ def register(faculty: schemas.FacultyCreate, request: Request, db: Session = Dep
         
         logger.info(f"Successful registration for user ID: {new_faculty.id} from IP: {faculty_ip}")
         
-        if faculty_ip in login_attempts:
-            login_attempts[faculty_ip] = []
+        rate_limit.reset_register_attempts(faculty_ip, r)
         
         return new_faculty
         
@@ -885,22 +1074,22 @@ def register(faculty: schemas.FacultyCreate, request: Request, db: Session = Dep
 
 
 @app.post('/faculty-login')
-def login(user: schemas.FacultyLogin, request: Request, db: Session = Depends(get_db_students)):
+async def login(user: schemas.FacultyLogin, request: Request, db: AsyncSession = Depends(get_async_db_students)):
     
     faculty_ip = get_client_ip(request)
+    limit_info = None
     print(f"[FACULTY-LOGIN] Starting login for IP: {faculty_ip}")
     
     try:
         print(f"[FACULTY-LOGIN] Checking rate limit for IP: {faculty_ip}")
         
-        rate_limit.check_faculty_rate_limit(faculty_ip, r)
+        limit_info = await run_in_threadpool(rate_limit.check_faculty_rate_limit, faculty_ip, r)
         print(f"[FACULTY-LOGIN] Rate limit check passed for IP: {faculty_ip}")
         
         if not user.email or not user.password:
             print(f"[FACULTY-LOGIN] Missing credentials for IP: {faculty_ip}")
             logger.warning(f"Login attempt with missing credentials from IP: {faculty_ip}")
-            rate_limit.record_faculty_failed_attempt(faculty_ip, r)
-            remaining = rate_limit.get_faculty_remaining_attempts(faculty_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400,
                 detail=f"Email and password are required. {remaining} attempts remaining."
@@ -912,8 +1101,7 @@ def login(user: schemas.FacultyLogin, request: Request, db: Session = Depends(ge
         if not validate_email(sanitized_email):
             print(f"[FACULTY-LOGIN] Invalid email format for IP: {faculty_ip}")
             logger.warning(f"Invalid email format attempted from IP: {faculty_ip}")
-            rate_limit.record_faculty_failed_attempt(faculty_ip, r)
-            remaining = rate_limit.get_faculty_remaining_attempts(faculty_ip, r)
+            remaining = limit_info["remaining"]
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid email format. {remaining} attempts remaining."
@@ -928,13 +1116,17 @@ def login(user: schemas.FacultyLogin, request: Request, db: Session = Depends(ge
         )
         
         try:
-            authenticated = crud.authenticate_faculty(db, sanitized_faculty)
+            authenticated = await async_crud.authenticate_faculty(db, sanitized_faculty)
             print(f"[FACULTY-LOGIN] Authentication successful: {authenticated}")
             
+        except HashPoolBusy:
+            # the password was never checked, give the reserved attempt back
+            await run_in_threadpool(rate_limit.release_faculty_attempt, faculty_ip, r)
+            raise
+
         except HTTPException as auth_error:
             print(f"[FACULTY-LOGIN] Authentication failed for IP: {faculty_ip} - {auth_error.detail}")
-            rate_limit.record_faculty_failed_attempt(faculty_ip, r)
-            remaining = rate_limit.get_faculty_remaining_attempts(faculty_ip, r)
+            remaining = limit_info["remaining"]
             logger.warning(
                 f"Failed login attempt for email hash: {hash_sensitive_data(sanitized_email)} "
                 f"from IP: {faculty_ip}"
@@ -947,8 +1139,7 @@ def login(user: schemas.FacultyLogin, request: Request, db: Session = Depends(ge
         
         if not authenticated:
             print(f"[FACULTY-LOGIN] Authentication returned False for IP: {faculty_ip}")
-            rate_limit.record_faculty_failed_attempt(faculty_ip, r)
-            remaining = rate_limit.get_faculty_remaining_attempts(faculty_ip, r)
+            remaining = limit_info["remaining"]
             logger.warning(
                 f"Failed login attempt for email hash: {hash_sensitive_data(sanitized_email)} "
                 f"from IP: {faculty_ip}"
@@ -960,7 +1151,7 @@ def login(user: schemas.FacultyLogin, request: Request, db: Session = Depends(ge
             )
         
         print(f"[LOGIN] Authentication successful for IP: {faculty_ip}")
-        rate_limit.reset_failed_attempts(faculty_ip, r)
+        await run_in_threadpool(rate_limit.reset_faculty_failed_attempts, faculty_ip, r)
         
         access_token = create_access_token(data={"sub": authenticated.id})
         
@@ -1012,8 +1203,7 @@ def login(user: schemas.FacultyLogin, request: Request, db: Session = Depends(ge
     except Exception as e:
         print(f"[FACULTY-LOGIN] Unexpected error for IP: {faculty_ip}: {e}")
         logger.error(f"Unexpected login error for IP: {faculty_ip}, Error: {str(e)}", exc_info=True)
-        rate_limit.record_faculty_failed_attempt(faculty_ip, r)
-        remaining = rate_limit.get_faculty_remaining_attempts(faculty_ip, r)
+        remaining = limit_info["remaining"] if limit_info else 0
         
         raise HTTPException(
             status_code=500,
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timezone
+import redis
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+import crud
+from database import SessionLocalMain
+from redis_connxn import r
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true"
+TOKEN_CLEANUP_INTERVAL_SECONDS = int(os.getenv("TOKEN_CLEANUP_INTERVAL_SECONDS", 600))
+TOKEN_CLEANUP_BATCH_SIZE = int(os.getenv("TOKEN_CLEANUP_BATCH_SIZE", 1000))
+
+LOCK_PREFIX = "maintenance:lock:"
+STATS_PREFIX = "maintenance:stats:"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Runs periodic jobs inside every worker, but a redis SET NX lock that lives for
+# the job's interval means only one worker in the cluster runs each job per interval.
+# The lock is left to expire rather than released, for the same reason.
+class MaintenanceScheduler:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.jobs = {}
+        self.tasks = []
+
+    def add_job(self, name: str, interval: int, func):
+        self.jobs[name] = {"interval": interval, "func": func}
+
+    def acquire_lock(self, name: str, interval: int) -> bool:
+        try:
+            return bool(self.redis_client.set(f"{LOCK_PREFIX}{name}", WORKER_ID, nx=True, ex=interval))
+        except redis.RedisError as e:
+            logger.warning(f"[MAINTENANCE] Could not take lock for {name}: {e}")
+            return False
+
+    def record_stats(self, name: str, stats: dict):
+        try:
+            self.redis_client.hset(f"{STATS_PREFIX}{name}", mapping=stats)
+        except redis.RedisError as e:
+            logger.warning(f"[MAINTENANCE] Could not record stats for {name}: {e}")
+
+    async def run_once(self, name: str):
+        job = self.jobs[name]
+        acquired = await run_in_threadpool(self.acquire_lock, name, job["interval"])
+        if not acquired:
+            return
+
+        started = time.perf_counter()
+        stats = {"last_run_at": datetime.now(timezone.utc).isoformat(), "worker": WORKER_ID}
+        try:
+            result = await run_in_threadpool(job["func"])
+            stats.update({"status": "ok", "result": str(result), "error": ""})
+        except Exception as e:
+            logger.error(f"[MAINTENANCE] Job {name} failed: {e}", exc_info=True)
+            stats.update({"status": "failed", "result": "", "error": str(e)[:500]})
+        stats["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        await run_in_threadpool(self.record_stats, name, stats)
+
+    async def job_loop(self, name: str):
+        interval = self.jobs[name]["interval"]
+        # jitter so workers started together don't all race for the lock
+        await asyncio.sleep(random.uniform(0, min(interval, 30)))
+        while True:
+            await self.run_once(name)
+            await asyncio.sleep(interval)
+
+    def start(self):
+        for name in self.jobs:
+            self.tasks.append(asyncio.create_task(self.job_loop(name)))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def get_stats(self):
+        stats = {}
+        for name, job in self.jobs.items():
+            try:
+                last_run = self.redis_client.hgetall(f"{STATS_PREFIX}{name}")
+            except redis.RedisError:
+                last_run = {}
+            stats[name] = {"interval_seconds": job["interval"], **last_run}
+        return stats
+
+def cleanup_expired_tokens_job():
+    db = SessionLocalMain()
+    try:
+        return crud.cleanup_expired_tokens(db, batch_size=TOKEN_CLEANUP_BATCH_SIZE)
+    finally:
+        db.close()
+
+scheduler = MaintenanceScheduler(r)
+scheduler.add_job("cleanup_expired_tokens", TOKEN_CLEANUP_INTERVAL_SECONDS, cleanup_expired_tokens_job)
@@ -1,11 +1,38 @@
+import logging
+import redis
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
 from fastapi import Request
 from fastapi.responses import JSONResponse
+from circuit_breaker import redis_breaker, LocalExpiringStore, REDIS_FALLBACK_MAX_ENTRIES
 from redis_connxn import r
 
+logger = logging.getLogger(__name__)
+
+BLACKLISTED = "blacklisted"
+
+# Logouts are recorded locally as well as in redis, so this worker keeps rejecting
+# the token even if redis is down or the breaker is open.
+local_blocklist = LocalExpiringStore(REDIS_FALLBACK_MAX_ENTRIES)
+
+def blacklist_token(key: str, ttl: int = 3600):
+    local_blocklist.set(key, BLACKLISTED, ttl)
+    try:
+        redis_breaker.call(r.set, key, BLACKLISTED, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"[BLOCKLIST] Only recorded {key[:12]}... locally: {e}")
+
+def is_blacklisted(key: str) -> bool:
+    if local_blocklist.get(key) == BLACKLISTED:
+        return True
+    try:
+        return redis_breaker.call(r.get, key) == BLACKLISTED
+    except redis.RedisError:
+        return False
+
 class TokenBlocklistMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         token = request.cookies.get("token")
-        if token and r.get(f"bl:{token}") == "blacklisted":
+        if token and await run_in_threadpool(is_blacklisted, f"bl:{token}"):
             return JSONResponse(status_code=401, content={"detail": "Token is blacklisted"})
-        return await call_next(request)
\ No newline at end of file
+        return await call_next(request)
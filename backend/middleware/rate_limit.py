@@ -0,0 +1,172 @@
+import json
+import logging
+import math
+import os
+import re
+import time
+import uuid
+import redis
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+from auth import get_client_ip, verify_token
+from circuit_breaker import redis_breaker, LocalExpiringStore, REDIS_FALLBACK_MAX_ENTRIES
+from redis_connxn import r
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_PREFIX = "ratelimit:"
+
+# First matching policy wins, so each request costs exactly one redis call.
+# While the redis breaker is open a per-process fallback applies the same policies.
+#   key: "ip" or "user" (the verified token's sub; falls back to ip without one)
+#   algorithm: "token_bucket" (limit is the burst, refilled evenly over window)
+#              or "sliding_window" (at most limit requests in any window)
+# Override the whole list with RATE_LIMIT_POLICIES (same shape, as JSON).
+DEFAULT_POLICIES = [
+    {"name": "auth", "pattern": r"^/(login|students-login|faculty-login|forgot-password|reset-password|register|students-register|faculty-register)$",
+     "methods": ["POST"], "key": "ip", "algorithm": "sliding_window", "limit": 20, "window": 60},
+    {"name": "export", "pattern": r"^/(users|salary_logs)/export$", "key": "ip", "algorithm": "sliding_window", "limit": 5, "window": 60},
+    {"name": "session", "pattern": r"^/api/", "key": "user", "algorithm": "token_bucket", "limit": 60, "window": 60},
+    {"name": "default", "pattern": r"", "key": "ip", "algorithm": "token_bucket", "limit": 300, "window": 60},
+]
+
+def load_policies():
+    raw = os.getenv("RATE_LIMIT_POLICIES")
+    policies = json.loads(raw) if raw else DEFAULT_POLICIES
+    for policy in policies:
+        policy["regex"] = re.compile(policy.get("pattern", ""))
+        policy["methods"] = {method.upper() for method in policy.get("methods", [])}
+    return policies
+
+RATE_LIMIT_POLICIES = load_policies()
+
+# both scripts return {allowed, remaining, ms until full quota, ms until next request is allowed}
+TOKEN_BUCKET_SCRIPT = r.register_script("""
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local rate = capacity / window
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], window)
+local retry = 0
+if allowed == 0 then
+    retry = math.ceil((1 - tokens) / rate)
+end
+return {allowed, math.floor(tokens), math.ceil((capacity - tokens) / rate), retry}
+""")
+
+SLIDING_WINDOW_SCRIPT = r.register_script("""
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    count = count + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', KEYS[1], window)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local reset = 0
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+local retry = 0
+if allowed == 0 then
+    retry = reset
+end
+return {allowed, limit - count, reset, retry}
+""")
+
+SCRIPTS = {"token_bucket": TOKEN_BUCKET_SCRIPT, "sliding_window": SLIDING_WINDOW_SCRIPT}
+
+def match_policy(method: str, path: str):
+    for policy in RATE_LIMIT_POLICIES:
+        if policy["methods"] and method not in policy["methods"]:
+            continue
+        if policy["regex"].search(path):
+            return policy
+    return None
+
+def get_identity(request: Request, policy: dict) -> str:
+    token = request.cookies.get("token")
+    if policy["key"] == "user" and token:
+        # only a verified token counts, otherwise rotating junk cookies would get a
+        # fresh bucket per request. Verification goes through the auth token cache
+        claims = verify_token(token)
+        if claims and claims.get("sub") is not None:
+            return f"user:{claims['sub']}"
+    return "ip:" + get_client_ip(request)
+
+def hit(policy: dict, identity: str):
+    key = f"{RATE_LIMIT_PREFIX}{policy['name']}:{identity}"
+    now_ms = int(time.time() * 1000)
+    allowed, remaining, reset_ms, retry_ms = redis_breaker.call(
+        SCRIPTS[policy["algorithm"]],
+        keys=[key],
+        args=[policy["limit"], policy["window"] * 1000, now_ms, uuid.uuid4().hex],
+    )
+    return bool(allowed), max(0, int(remaining)), int(reset_ms), int(retry_ms)
+
+# While redis is unavailable each worker enforces the policies on its own with a
+# fixed window per key. Limits are per process then, which is looser, but routes
+# stay limited and memory stays bounded.
+local_counters = LocalExpiringStore(REDIS_FALLBACK_MAX_ENTRIES)
+
+def local_hit(policy: dict, identity: str):
+    key = f"{policy['name']}:{identity}"
+    count, ttl = local_counters.incr(key, policy["window"], keep_ttl=True)
+    allowed = count <= policy["limit"]
+    reset_ms = ttl * 1000
+    return allowed, max(0, policy["limit"] - count), reset_ms, 0 if allowed else reset_ms
+
+def rate_limit_headers(policy: dict, remaining: int, reset_ms: int) -> dict:
+    return {
+        "RateLimit-Limit": str(policy["limit"]),
+        "RateLimit-Remaining": str(remaining),
+        "RateLimit-Reset": str(math.ceil(reset_ms / 1000)),
+        "RateLimit-Policy": f"{policy['limit']};w={policy['window']}",
+    }
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if not RATE_LIMIT_ENABLED or request.method == "OPTIONS":
+            return await call_next(request)
+        policy = match_policy(request.method, request.url.path)
+        if not policy:
+            return await call_next(request)
+
+        identity = get_identity(request, policy)
+        try:
+            allowed, remaining, reset_ms, retry_ms = await run_in_threadpool(hit, policy, identity)
+        except redis.RedisError as e:
+            # breaker open or redis failing: limit locally rather than not at all
+            if redis_breaker.state == "closed":
+                logger.warning(f"[RATE_LIMIT] Using local limiter for {policy['name']}: {e}")
+            allowed, remaining, reset_ms, retry_ms = local_hit(policy, identity)
+
+        headers = rate_limit_headers(policy, remaining, reset_ms)
+        if not allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(retry_ms / 1000)))
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"}, headers=headers)
+
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
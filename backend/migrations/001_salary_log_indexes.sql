@@ -0,0 +1,10 @@
+-- Supports GET /get_salary_logs filtered by emp_id and/or a changed_at range,
+-- paged by the (changed_at, id) keyset in either direction.
+-- CONCURRENTLY avoids blocking the salary_log trigger while the index builds,
+-- so run this file outside a transaction block (e.g. psql -f).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salary_log_emp_id_changed_at
+    ON salary_log (emp_id, changed_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salary_log_changed_at
+    ON salary_log (changed_at, id);
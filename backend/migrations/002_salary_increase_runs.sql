@@ -0,0 +1,23 @@
+-- Progress of chunked increase_all_salaries runs (POST /increase_all_salaries
+-- with chunked=true). last_id is advanced in the same transaction as each
+-- chunk's UPDATE, so a resumed run never applies an increase twice.
+
+CREATE TABLE IF NOT EXISTS salary_increase_runs (
+    id SERIAL PRIMARY KEY,
+    increase_percent INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    start_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    max_id INTEGER NOT NULL,
+    rows_updated INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running',
+    error TEXT,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+-- at most one run in flight at a time
+CREATE UNIQUE INDEX IF NOT EXISTS idx_salary_increase_runs_one_running
+    ON salary_increase_runs ((status))
+    WHERE status = 'running';
@@ -0,0 +1,5 @@
+-- Lets the maintenance job's batched cleanup find expired tokens without a
+-- full table scan. Run outside a transaction block (e.g. psql -f).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_password_reset_tokens_expires_at
+    ON password_reset_tokens (expires_at);
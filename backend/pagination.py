@@ -0,0 +1,47 @@
+import base64
+import json
+import os
+from typing import Optional
+from fastapi import HTTPException, Response
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# cursors are opaque to clients: base64 of the last key seen on the page
+def encode_cursor(last_key) -> str:
+    raw = json.dumps({"after": last_key}, default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor_value(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))["after"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(decode_cursor_value(cursor))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# queries fetch limit + 1 rows so we know whether another page exists.
+# key can be a tuple of columns for composite (e.g. timestamp, id) keysets
+def paginate(rows, limit: int, key="id"):
+    page = rows[:limit]
+    if len(rows) <= limit:
+        return page, None
+    last = page[-1]
+    last_key = [last[column] for column in key] if isinstance(key, tuple) else last[key]
+    return page, encode_cursor(last_key)
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
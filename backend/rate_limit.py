@@ -1,11 +1,17 @@
 from fastapi import HTTPException
+import heapq
+import math
+import threading
+import time
 import redis
+from circuit_breaker import redis_breaker, LocalExpiringStore, REDIS_FALLBACK_MAX_ENTRIES
 
 # Constants for different endpoints
 CLIENT_LOGIN_PREFIX = "client_login_attempts:"
 STUDENT_LOGIN_PREFIX = "student_login_attempts:"
 FACULTY_LOGIN_PREFIX = "faculty_login_attempts:"
 FORGOT_PASSWORD_PREFIX = "forgot_password_attempts:"
+REGISTER_PREFIX = "register_attempts:"
 
 
 BLOCK_TIME_SECONDS = 600  # 10 minutes
@@ -14,72 +20,227 @@ MAX_ATTEMPTS = 5
 FORGOT_PASSWORD_MAX_ATTEMPTS = 3
 FORGOT_PASSWORD_BLOCK_TIME = 900
 
-def check_rate_limit(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
+REGISTER_MAX_ATTEMPTS = 5
+REGISTER_BLOCK_TIME = 900
+
+# (max attempts, window in seconds) per endpoint, anything else uses the login limits
+LIMITS = {
+    FORGOT_PASSWORD_PREFIX: (FORGOT_PASSWORD_MAX_ATTEMPTS, FORGOT_PASSWORD_BLOCK_TIME),
+    REGISTER_PREFIX: (REGISTER_MAX_ATTEMPTS, REGISTER_BLOCK_TIME),
+}
+
+# Runs one counter operation and returns {attempts, remaining, ttl, allowed} in a
+# single round trip. ARGV[3] picks it: '0' reads, '1' increments, '2' reserves an
+# attempt (increments only while under the limit, so the check and the count it's
+# judged by are one step and parallel requests can't all slip past a read), '3'
+# gives back a reserved attempt that never reached a password check.
+ATTEMPTS_SCRIPT = """
+local max_attempts = tonumber(ARGV[1])
+local attempts = tonumber(redis.call('GET', KEYS[1]) or '0')
+local allowed = 1
+if ARGV[3] == '1' then
+    attempts = redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+elseif ARGV[3] == '2' then
+    if attempts >= max_attempts then
+        allowed = 0
+    else
+        attempts = redis.call('INCR', KEYS[1])
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+elseif ARGV[3] == '3' and attempts > 0 then
+    attempts = redis.call('DECR', KEYS[1])
+end
+local ttl = -1
+if attempts > 0 then
+    ttl = redis.call('TTL', KEYS[1])
+end
+return {attempts, math.max(0, max_attempts - attempts), ttl, allowed}
+"""
+
+READ, INCREMENT, RESERVE, RELEASE = 0, 1, 2, 3
+
+registered_scripts = {}
+
+# per-process attempt counters used while the redis breaker is open. Limits are
+# per worker then rather than global, which is looser but keeps logins working.
+local_attempts = LocalExpiringStore(REDIS_FALLBACK_MAX_ENTRIES)
+
+# "blocked until" per (endpoint, ip), filled from the ttl redis returns once an ip
+# runs out of attempts, so repeat requests during the block get their 429 without
+# touching redis. Expiry order is kept in a heap: expired entries go first, and if
+# the cache is still full the block ending soonest is dropped (redis still has it).
+BLOCKED_CACHE_MAX_ENTRIES = 10000
+
+class BlockedIPCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.blocked_until = {}
+        self.expiry_heap = []
+        self.lock = threading.Lock()
+
+    def evict(self, now: float):
+        while self.expiry_heap:
+            deadline, key = self.expiry_heap[0]
+            if deadline > now and len(self.blocked_until) <= self.max_entries:
+                break
+            heapq.heappop(self.expiry_heap)
+            # skip stale heap entries left behind by a re-block
+            if self.blocked_until.get(key) == deadline:
+                del self.blocked_until[key]
+
+    def block(self, endpoint_prefix: str, client_ip: str, ttl: int):
+        key = (endpoint_prefix, client_ip)
+        deadline = time.monotonic() + ttl
+        with self.lock:
+            self.blocked_until[key] = deadline
+            heapq.heappush(self.expiry_heap, (deadline, key))
+            if len(self.expiry_heap) > 2 * self.max_entries:
+                self.expiry_heap = [(until, key) for key, until in self.blocked_until.items()]
+                heapq.heapify(self.expiry_heap)
+            self.evict(time.monotonic())
+
+    # seconds left on the block, or 0 if not (known to be) blocked
+    def get(self, endpoint_prefix: str, client_ip: str) -> int:
+        now = time.monotonic()
+        with self.lock:
+            deadline = self.blocked_until.get((endpoint_prefix, client_ip))
+            if not deadline:
+                return 0
+            if deadline <= now:
+                self.evict(now)
+                return 0
+            return math.ceil(deadline - now)
+
+    def unblock(self, endpoint_prefix: str, client_ip: str):
+        with self.lock:
+            self.blocked_until.pop((endpoint_prefix, client_ip), None)
+
+blocked_ips = BlockedIPCache(BLOCKED_CACHE_MAX_ENTRIES)
+
+def get_limits(endpoint_prefix: str):
+    return LIMITS.get(endpoint_prefix, (MAX_ATTEMPTS, BLOCK_TIME_SECONDS))
+
+def run_local_attempts(key: str, max_attempts: int, block_seconds: int, mode: int):
+    attempts, ttl = local_attempts.peek(key)
+    allowed = 1
+    if mode == INCREMENT or (mode == RESERVE and attempts < max_attempts):
+        attempts, ttl = local_attempts.incr(key, block_seconds)
+    elif mode == RESERVE:
+        allowed = 0
+    elif mode == RELEASE and attempts > 0:
+        attempts, ttl = local_attempts.incr(key, block_seconds, keep_ttl=True, amount=-1)
+    return attempts, max(0, max_attempts - attempts), ttl, allowed
+
+def run_attempts_script(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str, mode: int):
+    if redis_client not in registered_scripts:
+        registered_scripts[redis_client] = redis_client.register_script(ATTEMPTS_SCRIPT)
+    max_attempts, block_seconds = get_limits(endpoint_prefix)
     key = f"{endpoint_prefix}{client_ip}"
-    attempts = redis_client.get(key)
-    print(f"[check_rate_limit] {key} = {attempts}")
+    try:
+        attempts, remaining, ttl, allowed = redis_breaker.call(
+            registered_scripts[redis_client],
+            keys=[key],
+            args=[max_attempts, block_seconds, mode],
+        )
+    except redis.RedisError as e:
+        print(f"[RateLimit] redis unavailable, using local counters: {e}")
+        attempts, remaining, ttl, allowed = run_local_attempts(key, max_attempts, block_seconds, mode)
+    if int(remaining) == 0 and int(ttl) > 0:
+        blocked_ips.block(endpoint_prefix, client_ip, int(ttl))
+    elif mode == RELEASE:
+        blocked_ips.unblock(endpoint_prefix, client_ip)
+    return {
+        "attempts": int(attempts),
+        "remaining": int(remaining),
+        "ttl": int(ttl),
+        "max_attempts": max_attempts,
+        "allowed": bool(int(allowed)),
+    }
+
+# Reserves one attempt for this request or raises 429. The reservation is the
+# failure count: a successful login clears it with reset_failed_attempts, a
+# failed one just keeps it, and info["remaining"] is what's left after it.
+def check_rate_limit(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
+    ttl = blocked_ips.get(endpoint_prefix, client_ip)
+    if ttl:
+        max_attempts, _ = get_limits(endpoint_prefix)
+        print(f"[RateLimit] BLOCKED {client_ip} for {ttl} seconds (cached)")
+        raise HTTPException(
+            status_code=429,
+            detail=(
+                f"Too many login attempts. "
+                f"Try again in {ttl} seconds. "
+                f"You used {max_attempts} of {max_attempts} attempts."
+            )
+        )
+
+    info = run_attempts_script(client_ip, redis_client, endpoint_prefix, RESERVE)
+    print(f"[check_rate_limit] {endpoint_prefix}{client_ip} = {info['attempts']}")
     
-    if attempts:
-        attempts = int(attempts)
-        if attempts >= MAX_ATTEMPTS:
-            ttl = redis_client.ttl(key)
-            print(f"[RateLimit] BLOCKED {client_ip} for {ttl} seconds")
-            raise HTTPException(
-                status_code=429,
-                detail=(
-                    f"Too many login attempts. "
-                    f"Try again in {ttl} seconds. "
-                    f"You used {attempts} of {MAX_ATTEMPTS} attempts."
-                )
+    if not info["allowed"]:
+        print(f"[RateLimit] BLOCKED {client_ip} for {info['ttl']} seconds")
+        raise HTTPException(
+            status_code=429,
+            detail=(
+                f"Too many login attempts. "
+                f"Try again in {info['ttl']} seconds. "
+                f"You used {info['attempts']} of {info['max_attempts']} attempts."
             )
+        )
+    return info
 
+# returns the attempts left after this failure
 def record_failed_attempt_redis(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
-    key = f"{endpoint_prefix}{client_ip}"
-    print(f"[record_failed_attempt] Incrementing {key}")
+    print(f"[record_failed_attempt] Incrementing {endpoint_prefix}{client_ip}")
     
     try:
-        pipe = redis_client.pipeline()
-        pipe.incr(key)
-        pipe.expire(key, BLOCK_TIME_SECONDS)
-        pipe.execute()
-        current_attempts = redis_client.get(key)
-        print(f"[record_failed_attempt] Current value: {current_attempts}")
+        info = run_attempts_script(client_ip, redis_client, endpoint_prefix, INCREMENT)
+        print(f"[record_failed_attempt] Current value: {info['attempts']}")
         
         # Check if we've hit the limit and warn
-        if current_attempts and int(current_attempts) >= MAX_ATTEMPTS:
-            print(f"[record_failed_attempt] IP {client_ip} has reached max attempts ({MAX_ATTEMPTS})")
+        if info["remaining"] == 0:
+            print(f"[record_failed_attempt] IP {client_ip} has reached max attempts ({info['max_attempts']})")
+        return info["remaining"]
             
     except Exception as e:
         print(f"[record_failed_attempt] Error: {e}")
         raise
+
+# hands back an attempt reserved by check_rate_limit when the request failed
+# before the password was checked (e.g. the hash pool was busy)
+def release_attempt(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
+    try:
+        info = run_attempts_script(client_ip, redis_client, endpoint_prefix, RELEASE)
+        print(f"[release_attempt] {endpoint_prefix}{client_ip} = {info['attempts']}")
+    except Exception as e:
+        print(f"[release_attempt] Error: {e}")
     
 def reset_failed_attempts(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
     key = f"{endpoint_prefix}{client_ip}"
-    deleted = redis_client.delete(key)
+    local_attempts.delete(key)
+    try:
+        deleted = redis_breaker.call(redis_client.delete, key)
+    except redis.RedisError as e:
+        deleted = f"skipped ({e})"
+    blocked_ips.unblock(endpoint_prefix, client_ip)
     print(f"[reset_failed_attempts] Deleted {key}, result: {deleted}")
     
 def get_remaining_attempts(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
-    key = f"{endpoint_prefix}{client_ip}"
-    attempts = redis_client.get(key)
-    attempts = int(attempts) if attempts else 0
-    remaining = max(0, MAX_ATTEMPTS - attempts)
-    print(f"[get_remaining_attempts] IP {client_ip}: {attempts} attempts used, {remaining} remaining")
-    return remaining
+    info = run_attempts_script(client_ip, redis_client, endpoint_prefix, READ)
+    print(f"[get_remaining_attempts] IP {client_ip}: {info['attempts']} attempts used, {info['remaining']} remaining")
+    return info["remaining"]
 
 def get_rate_limit_info(client_ip: str, redis_client: redis.Redis, endpoint_prefix: str = CLIENT_LOGIN_PREFIX):
-    key = f"{endpoint_prefix}{client_ip}"
-    attempts = redis_client.get(key)
-    attempts = int(attempts) if attempts else 0
-    ttl = redis_client.ttl(key) if attempts > 0 else -1
-    remaining = max(0, MAX_ATTEMPTS - attempts)
+    info = run_attempts_script(client_ip, redis_client, endpoint_prefix, READ)
     
     return {
         "ip": client_ip,
-        "attempts": attempts,
-        "max_attempts": MAX_ATTEMPTS,
-        "remaining": remaining,
-        "ttl": ttl,
-        "blocked": attempts >= MAX_ATTEMPTS,
+        "attempts": info["attempts"],
+        "max_attempts": info["max_attempts"],
+        "remaining": info["remaining"],
+        "ttl": info["ttl"],
+        "blocked": info["remaining"] == 0,
         "endpoint": endpoint_prefix.rstrip(':')
     }
 
@@ -96,6 +257,15 @@ def record_client_failed_attempt(client_ip: str, redis_client: redis.Redis):
 def record_student_failed_attempt(client_ip: str, redis_client: redis.Redis):
     return record_failed_attempt_redis(client_ip, redis_client, STUDENT_LOGIN_PREFIX)
 
+def release_client_attempt(client_ip: str, redis_client: redis.Redis):
+    return release_attempt(client_ip, redis_client, CLIENT_LOGIN_PREFIX)
+
+def release_student_attempt(client_ip: str, redis_client: redis.Redis):
+    return release_attempt(client_ip, redis_client, STUDENT_LOGIN_PREFIX)
+
+def reset_student_failed_attempts(client_ip: str, redis_client: redis.Redis):
+    return reset_failed_attempts(client_ip, redis_client, STUDENT_LOGIN_PREFIX)
+
 def get_client_remaining_attempts(client_ip: str, redis_client: redis.Redis):
     return get_remaining_attempts(client_ip, redis_client, CLIENT_LOGIN_PREFIX)
 
@@ -108,21 +278,31 @@ def check_faculty_rate_limit(client_ip: str, redis_client: redis.Redis):
 def record_faculty_failed_attempt(client_ip: str, redis_client: redis.Redis):
     return record_failed_attempt_redis(client_ip, redis_client, FACULTY_LOGIN_PREFIX)
 
+def release_faculty_attempt(client_ip: str, redis_client: redis.Redis):
+    return release_attempt(client_ip, redis_client, FACULTY_LOGIN_PREFIX)
+
+def reset_faculty_failed_attempts(client_ip: str, redis_client: redis.Redis):
+    return reset_failed_attempts(client_ip, redis_client, FACULTY_LOGIN_PREFIX)
+
 def get_faculty_remaining_attempts(client_ip: str, redis_client: redis.Redis):
     return get_remaining_attempts(client_ip, redis_client, FACULTY_LOGIN_PREFIX)
 
 def check_forgot_password_rate_limit(client_ip: str, redis_client: redis.Redis):
-    key = f"{FORGOT_PASSWORD_PREFIX}{client_ip}"
-    attempts = redis_client.get(key)
+    ttl = blocked_ips.get(FORGOT_PASSWORD_PREFIX, client_ip)
+    if ttl:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many password reset attempts. Try again in {ttl} seconds."
+        )
+
+    info = run_attempts_script(client_ip, redis_client, FORGOT_PASSWORD_PREFIX, RESERVE)
     
-    if attempts:
-        attempts = int(attempts)
-        if attempts >= FORGOT_PASSWORD_MAX_ATTEMPTS:
-            ttl = redis_client.ttl(key)
-            raise HTTPException(
-                status_code=429,
-                detail=f"Too many password reset attempts. Try again in {ttl} seconds."
-            )
+    if not info["allowed"]:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many password reset attempts. Try again in {info['ttl']} seconds."
+        )
+    return info
 
 def record_forgot_password_failed_attempt(client_ip: str, redis_client: redis.Redis):
     return record_failed_attempt_redis(client_ip, redis_client, FORGOT_PASSWORD_PREFIX)
@@ -132,5 +312,28 @@ def get_forgot_password_remaining_attempts(client_ip: str, redis_client: redis.R
 
 def reset_forgot_password_attempts(client_ip: str, redis_client: redis.Redis):
     key = f"{FORGOT_PASSWORD_PREFIX}{client_ip}"
-    deleted = redis_client.delete(key)
-    print(f"[reset_failed_attempts] Deleted {key}, result: {deleted}")
\ No newline at end of file
+    local_attempts.delete(key)
+    try:
+        deleted = redis_breaker.call(redis_client.delete, key)
+    except redis.RedisError as e:
+        deleted = f"skipped ({e})"
+    blocked_ips.unblock(FORGOT_PASSWORD_PREFIX, client_ip)
+    print(f"[reset_failed_attempts] Deleted {key}, result: {deleted}")
+
+# registration (client, student and faculty) counts invalid submissions per ip
+def check_register_rate_limit(client_ip: str, redis_client: redis.Redis):
+    ttl = blocked_ips.get(REGISTER_PREFIX, client_ip)
+    if not ttl:
+        info = run_attempts_script(client_ip, redis_client, REGISTER_PREFIX, READ)
+        ttl = info["ttl"] if info["remaining"] == 0 else 0
+    if ttl:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many failed attempts. Try again in {ttl} seconds"
+        )
+
+def record_register_failed_attempt(client_ip: str, redis_client: redis.Redis):
+    return record_failed_attempt_redis(client_ip, redis_client, REGISTER_PREFIX)
+
+def reset_register_attempts(client_ip: str, redis_client: redis.Redis):
+    return reset_failed_attempts(client_ip, redis_client, REGISTER_PREFIX)
@@ -10,8 +10,20 @@ REDIS_URL = os.getenv("REDIS_URL")
 if not REDIS_URL:
     raise ValueError("REDIS_URL is not set in .env")
 
+# Timeouts keep a slow or unreachable redis from stalling requests indefinitely
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 1.0))
+
 # Connect to Upstash
-r = redis.from_url(REDIS_URL, decode_responses=True)
+r = redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
 
 # Test connection
-print("Connected:", r.ping())
\ No newline at end of file
+try:
+    print("Connected:", r.ping())
+except redis.RedisError as e:
+    print("Redis unavailable at startup:", e)
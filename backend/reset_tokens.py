@@ -0,0 +1,58 @@
+import hashlib
+import os
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import crud
+from hashing_pool import hash_password
+from redis_connxn import r
+
+load_dotenv()
+
+# "db" keeps tokens in the password_reset_tokens table, "redis" keeps a hash of
+# the token under one key per user and lets redis expire it
+RESET_TOKEN_STORE = os.getenv("RESET_TOKEN_STORE", "db").lower()
+RESET_TOKEN_TTL_SECONDS = 30 * 60
+RESET_TOKEN_PREFIX = "pwreset:"
+
+# delete only if the stored hash matches, so a wrong token can't burn a valid one
+CONSUME_TOKEN_SCRIPT = r.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+def use_redis() -> bool:
+    return RESET_TOKEN_STORE == "redis"
+
+def token_key(user_id: int) -> str:
+    return f"{RESET_TOKEN_PREFIX}{user_id}"
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def store_reset_token(db: Session, user_id: int, token: str):
+    if not use_redis():
+        return crud.store_password_reset_token(db, user_id, token)
+    # SET replaces any earlier token for this user
+    r.set(token_key(user_id), hash_token(token), ex=RESET_TOKEN_TTL_SECONDS)
+
+def discard_reset_token(db: Session, user_id: int, token: str):
+    if not use_redis():
+        return crud.delete_reset_token(db, user_id, token)
+    consume_reset_token(user_id, token)
+
+def consume_reset_token(user_id: int, token: str) -> bool:
+    return CONSUME_TOKEN_SCRIPT(keys=[token_key(user_id)], args=[hash_token(token)]) == 1
+
+# returns the client (for the confirmation mail) or None if the token is invalid
+def reset_password(db: Session, user_id: int, token: str, new_password: str):
+    if not use_redis():
+        return crud.reset_password_with_token(db, user_id, token, new_password)
+    # hash before touching the token: a busy hashing pool (503) must not cost the
+    # user their reset link. Then consume: if the update fails the token is gone
+    # but the password is unchanged, never the other way round
+    hashed_password = hash_password(new_password)
+    if not consume_reset_token(user_id, token):
+        return None
+    return crud.update_user_password_hash(db, user_id, hashed_password)
@@ -1,7 +1,8 @@
 from fastapi import Request, APIRouter
 from fastapi.responses import JSONResponse
-from auth import get_current_user
-from redis_connxn import r
+from starlette.concurrency import run_in_threadpool
+from auth import get_current_user, revoke_token
+from middleware.blacklist_token import blacklist_token
 
 user_router = APIRouter()
 
@@ -9,7 +10,8 @@ user_router = APIRouter()
 async def logout(request: Request):
     token = request.cookies.get("token")
     if token:
-        r.set(f"bl:{token}", "blacklisted", ex=3600)
+        await run_in_threadpool(blacklist_token, f"bl:{token}", 3600)
+        revoke_token(token)
     
     response = JSONResponse(content={"message": "Logout successful"}, status_code=200)
     response.delete_cookie("token")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Optional, List
 
 class UserCreate(BaseModel):
     name: str
@@ -21,6 +21,23 @@ class UserUpdate(BaseModel):
 class UserDelete(BaseModel):
     reason: str
     
+class UserBulkUpdate(UserUpdate):
+    id: int
+    
+class UserBulkDelete(BaseModel):
+    ids: List[int]
+    
+class BulkItemResult(BaseModel):
+    index: int
+    status: str
+    user: Optional[UserResponse] = None
+    detail: Optional[str] = None
+    
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+    succeeded: int
+    failed: int
+    
 class AddNumbers(BaseModel):
     a: int
     b: int
@@ -28,15 +45,27 @@ class AddNumbers(BaseModel):
 class ToFarenheit(BaseModel):
     celsius: float
     
+class ArithmeticBatch(BaseModel):
+    square: List[int] = []
+    add_numbers: List[AddNumbers] = []
+    celsius_to_fahrenheit: List[float] = []
+    check_even_odd: List[int] = []
+    
 class SalaryUpdate(BaseModel):
     new_salary: int
     
+class SalaryBulkUpdateItem(BaseModel):
+    emp_id: int
+    new_salary: int
+    
 class AddEmployee(BaseModel):
     emp_name: str
     emp_salary: int
     
 class SalaryIncrease(BaseModel):
     increase_percent: int
+    chunked: bool = False
+    chunk_size: Optional[int] = None
     
 class ClientCreate(BaseModel):
     firstname: str
@@ -74,17 +74,24 @@ function Home() {
     const fetchUsers = async () => {
         setLoading(true);
         try {
-            const response = await axios.get(`${API_URL_CRUD}`);
-            console.log("API Response:", response.data); // Debugging
-
-            if (Array.isArray(response.data)) {
-                setUsers(response.data);
-            } else if (response.data && Array.isArray(response.data.users)) {
-                setUsers(response.data.users);
-            } else {
-                console.error("Unexpected API response format", response.data);
-                setUsers([]); // Fallback to empty array
-            }
+            // the api returns one page at a time, the next page's cursor is in X-Next-Cursor
+            let allUsers = [];
+            let cursor = null;
+            do {
+                const response = await axios.get(`${API_URL_CRUD}`, { params: cursor ? { limit: 1000, cursor } : { limit: 1000 } });
+                console.log("API Response:", response.data); // Debugging
+
+                if (Array.isArray(response.data)) {
+                    allUsers = allUsers.concat(response.data);
+                } else if (response.data && Array.isArray(response.data.users)) {
+                    allUsers = allUsers.concat(response.data.users);
+                } else {
+                    console.error("Unexpected API response format", response.data);
+                    break;
+                }
+                cursor = response.headers["x-next-cursor"];
+            } while (cursor);
+            setUsers(allUsers);
         } catch (error) {
             console.error("Error fetching users:", error);
             setUsers([]); // Ensure it's always an array
@@ -5,15 +5,19 @@ import './SalaryLogsComponents.css'
 const SalaryLogsComponent = ({ state, dispatch, API_URL }) => {
     const [showLogs, setShowLogs] = useState(false);
     const [loading, setLoading] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
 
-    const fetchData = async (endpoint, params, resultField) => {
+    // newest logs first; the next page's cursor comes back in X-Next-Cursor
+    const fetchData = async (endpoint, params, resultField, append = false) => {
         setLoading(true);
         try {
             const response = await axios.get(`${API_URL}/${endpoint}`, {
                 params,
                 headers: { 'Content-Type': 'application/json' },
             });
-            dispatch({ type: "SET_RESULT", field: resultField, value: response.data });
+            const logs = append ? state.salaryLogs.concat(response.data) : response.data;
+            dispatch({ type: "SET_RESULT", field: resultField, value: logs });
+            setNextCursor(response.headers["x-next-cursor"] || null);
             setShowLogs(true); // Show after fetch
         } catch (error) {
             console.error("Error:", error);
@@ -37,8 +41,14 @@ const SalaryLogsComponent = ({ state, dispatch, API_URL }) => {
                             </li>
                         ))}
                     </ul>
+                    {nextCursor && (
+                        <button disabled={loading} onClick={() => fetchData("get_salary_logs", { cursor: nextCursor }, "salaryLogs", true)}>
+                            {loading ? <div className="spinner"></div> : 'Load older logs'}
+                        </button>
+                    )}
                     <div className="logsButton" onClick={() => {
                         setShowLogs(false);
+                        setNextCursor(null);
                         dispatch({ type: "SET_RESULT", field: "salaryLogs", value: [] });
                     }} style={{ marginTop: '10px' }}>
                         <span className="X"></span>